@@ -0,0 +1,125 @@
+import sys
+sys.path.append('..')
+
+from src.congestion import algorithms
+from src.sweep import Sweep
+from src.transport import Transport
+from src.tcp import TCP
+
+import optparse
+
+class Sink(object):
+    ''' Application that counts the bytes it receives. '''
+    def __init__(self):
+        self.bytes = 0
+
+    def receive_data(self,data):
+        self.bytes += len(data)
+
+def fairness(values):
+    ''' Jain's fairness index. '''
+    total = sum(values)
+    squares = sum(value*value for value in values)
+    if squares == 0:
+        return 0
+    return total*total/(len(values)*squares)
+
+def scenario(net,flows,duration,gap,history):
+    ''' Run one TCP flow per algorithm in flows across the bottleneck of
+        the dumbbell network for duration seconds, starting them gap
+        seconds apart. Goodput is measured for all flows over the same
+        window, from the start of the last flow to the end of the run. '''
+    net.install_routes()
+    senders = [net.get_node('s1'),net.get_node('s2')]
+    receivers = [net.get_node('d1'),net.get_node('d2')]
+    transports = {}
+    for node in senders + receivers:
+        transports[node] = Transport(node)
+    size = int(duration*net.get_node('r1').get_link('r2').bandwidth/8)
+
+    sinks = []
+    congestions = []
+    for i,name in enumerate(flows):
+        source = senders[i % 2]
+        destination = receivers[i % 2]
+        sink = Sink()
+        congestion = algorithms[name]()
+        c1 = TCP(transports[source],source.get_address('r1'),i+1,
+                 destination.get_address('r2'),i+1,sink,window=1000000,
+                 congestion=congestion)
+        c2 = TCP(transports[destination],destination.get_address('r2'),i+1,
+                 source.get_address('r1'),i+1,sink,window=1000000)
+        net.sim.scheduler.add(delay=i*gap, event='x'*size, handler=c1.send)
+        sinks.append(sink)
+        congestions.append(congestion)
+    # bytes each flow had received when the last one started
+    start = (len(flows) - 1)*gap
+    if start >= duration:
+        raise ValueError("the last flow starts after the end of the run")
+    started = []
+    net.sim.scheduler.add(delay=start, event=None,
+                          handler=lambda event: started.extend(sink.bytes for sink in sinks))
+    net.sim.scheduler.add(delay=duration, event=None,
+                          handler=lambda event: net.sim.scheduler.stop())
+
+    def result():
+        window = duration - start
+        received = [sink.bytes - before for sink,before in zip(sinks,started)]
+        goodputs = [8.0*bytes/window for bytes in received]
+        result = {'goodputs':goodputs,'total':8.0*sum(received)/window,
+                  'fairness':fairness(goodputs)}
+        if history:
+            result['history'] = [congestion.history for congestion in congestions]
+        return result
+    return result
+
+if __name__ == '__main__':
+    parser = optparse.OptionParser(usage = "%prog [options]",
+                                   version = "%prog 0.1")
+    parser.add_option("-p","--processes",type="int",dest="processes",
+                      default=None,
+                      help="number of worker processes")
+    parser.add_option("-a","--algorithms",type="str",dest="algorithms",
+                      default='reno,newreno,cubic,bbr',
+                      help="comma-separated congestion control algorithms")
+    parser.add_option("-n","--flows",type="int",dest="flows",
+                      default=2,
+                      help="number of competing flows of each algorithm")
+    parser.add_option("-m","--mixed",action="store_true",dest="mixed",
+                      default=False,
+                      help="also run one flow of every algorithm together")
+    parser.add_option("-d","--duration",type="float",dest="duration",
+                      default=20,
+                      help="duration of each run in seconds")
+    parser.add_option("-g","--gap",type="float",dest="gap",
+                      default=1,
+                      help="seconds between the start of each flow")
+    parser.add_option("-o","--output",type="str",dest="output",
+                      default=None,
+                      help="write the cwnd and RTT of each flow to files with this prefix")
+    (options,args) = parser.parse_args()
+
+    names = options.algorithms.split(',')
+    grid = [{'flows':[name]*options.flows} for name in names]
+    if options.mixed:
+        grid.append({'flows':names})
+    for params in grid:
+        params.update({'duration':options.duration,'gap':options.gap,
+                       'history':options.output is not None})
+    sweep = Sweep('../networks/dumbbell.txt',scenario,grid,
+                  processes=options.processes)
+    records = sorted(sweep.run(),key=lambda record: record['index'])
+    print "%-32s %-32s %8s %8s" % ('flows','goodput (Mbps)','total','fairness')
+    for record in records:
+        result = record['result']
+        goodputs = ' '.join('%.2f' % (goodput/1000000) for goodput in result['goodputs'])
+        print "%-32s %-32s %8.2f %8.3f" % (','.join(record['params']['flows']),
+                                           goodputs,
+                                           result['total']/1000000,
+                                           result['fairness'])
+        if options.output:
+            for i,history in enumerate(result['history']):
+                filename = "%s-%d-%d.txt" % (options.output,record['index'],i)
+                with open(filename,'w') as f:
+                    for time,cwnd,srtt in history:
+                        f.write("%f %f %s\n" % (time,cwnd,srtt))
@@ -0,0 +1,86 @@
+import sys
+sys.path.append('..')
+
+from src.sweep import Sweep
+from src.transport import Transport
+from src.tcp import TCP
+
+import functools
+import optparse
+
+# port the receiver listens on
+PORT = 80
+
+class Sink(object):
+    ''' Application that counts the bytes it receives. '''
+    def __init__(self,sim):
+        self.sim = sim
+        self.bytes = 0
+        self.finished = 0
+
+    def receive_data(self,data):
+        self.bytes += len(data)
+        self.finished = self.sim.scheduler.current_time()
+
+def scenario(net,flows,size,window):
+    ''' Start flows TCP connections at once from s1 and s2 to one
+        listening port on d1, each sending size bytes. The connections
+        on d1 are created by its transport when their first packet
+        arrives. '''
+    net.install_routes()
+    senders = [net.get_node('s1'),net.get_node('s2')]
+    receiver = net.get_node('d1')
+    transports = {}
+    for node in senders + [receiver]:
+        transports[node] = Transport(node)
+    sink = Sink(net.sim)
+    transports[receiver].listen(PORT,functools.partial(TCP,app=sink,
+                                                       window=window))
+
+    address = receiver.get_address('r2')
+    for i in range(flows):
+        source = senders[i % 2]
+        c = TCP(transports[source],source.get_address('r1'),1024 + i/2,
+                address,PORT,window=window)
+        net.sim.scheduler.add(delay=0, event='x'*size, handler=c.send)
+
+    def result():
+        connections = transports[receiver].binding.values()
+        completed = len([c for c in connections if c.ack >= size])
+        # every event and timer takes the next number from the count
+        return {'bytes':sink.bytes,'finished':sink.finished,
+                'completed':completed,
+                'events':next(net.sim.scheduler.count)}
+    return result
+
+if __name__ == '__main__':
+    parser = optparse.OptionParser(usage = "%prog [options]",
+                                   version = "%prog 0.1")
+    parser.add_option("-p","--processes",type="int",dest="processes",
+                      default=None,
+                      help="number of worker processes")
+    parser.add_option("-n","--flows",type="str",dest="flows",
+                      default='100,1000,10000',
+                      help="comma-separated numbers of concurrent flows")
+    parser.add_option("-s","--size",type="int",dest="size",
+                      default=1000,
+                      help="number of bytes each flow sends")
+    parser.add_option("-w","--window",type="int",dest="window",
+                      default=4000,
+                      help="window size in bytes")
+    (options,args) = parser.parse_args()
+
+    grid = {'flows':[int(flows) for flows in options.flows.split(',')],
+            'size':[options.size],
+            'window':[options.window]}
+    sweep = Sweep('../networks/dumbbell.txt',scenario,grid,
+                  processes=options.processes)
+    records = sorted(sweep.run(),key=lambda record: record['params']['flows'])
+    print "%8s %10s %10s %10s %10s" % ('flows','completed','time','elapsed','events')
+    for record in records:
+        result = record['result']
+        print "%8d %10d %9.3fs %9.3fs %10d" % (record['params']['flows'],
+                                              result['completed'],
+                                              result['finished'],
+                                              record['elapsed'],
+                                              result['events'])
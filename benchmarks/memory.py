@@ -0,0 +1,92 @@
+import sys
+sys.path.append('..')
+
+import optparse
+import os
+import resource
+import subprocess
+
+class DictPacket(object):
+    ''' The packet representation used before packets had slots. '''
+    def __init__(self,source_address=1,source_port=0,
+                 destination_address=1,destination_port=0,
+                 ident=0,ttl=100,protocol="None",body="",length=0):
+        self.source_address = source_address
+        self.source_port = source_port
+        self.destination_address = destination_address
+        self.destination_port = destination_port
+        self.ident = ident
+        self.ttl = ttl
+        self.protocol = protocol
+        self.body = body
+        self.length = length
+        if self.body:
+            self.length = len(self.body)
+        self.created = None
+        self.enter_queue = 0
+        self.queueing_delay = 0
+        self.transmission_delay = 0
+        self.propagation_delay = 0
+
+class DictTCPPacket(DictPacket):
+    def __init__(self,sequence=0,ack_number=0,**fields):
+        DictPacket.__init__(self,**fields)
+        self.sequence = sequence
+        self.ack_number = ack_number
+
+def rss():
+    ''' Peak resident set size of this process in megabytes. '''
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss/1024.0
+
+def workload(kind,count,links):
+    ''' Queue count TCP segments on the links of a chain of nodes and
+        return the growth in peak RSS.'''
+    from src.sim import Simulation
+    from src.node import Node
+    from src.link import Link
+    from src.tcppacket import TCPPacket
+
+    cls = TCPPacket if kind == 'slots' else DictTCPPacket
+    sim = Simulation()
+    nodes = [Node('n%d' % i,sim=sim) for i in range(links+1)]
+    queues = []
+    for i in range(links):
+        link = Link(i+1,nodes[i],nodes[i+1],sim=sim)
+        nodes[i].add_link(link)
+        queues.append(link)
+    before = rss()
+    for i in range(count):
+        packet = cls(source_address=1,source_port=1,destination_address=2,
+                     destination_port=1,ident=i,length=1000,
+                     sequence=1000*i,ack_number=0)
+        queues[i % links].send_packet(packet)
+    return rss() - before
+
+if __name__ == '__main__':
+    parser = optparse.OptionParser(usage = "%prog [options]",
+                                   version = "%prog 0.1")
+    parser.add_option("-n","--packets",type="int",dest="packets",
+                      default=1000000,
+                      help="number of packets in flight")
+    parser.add_option("-l","--links",type="int",dest="links",
+                      default=10,
+                      help="number of link queues to spread them over")
+    parser.add_option("--worker",type="str",dest="worker",
+                      default=None,
+                      help=optparse.SUPPRESS_HELP)
+    (options,args) = parser.parse_args()
+
+    if options.worker:
+        print workload(options.worker,options.packets,options.links)
+        sys.exit(0)
+
+    results = {}
+    for kind in ('dict','slots'):
+        args = [sys.executable,os.path.abspath(__file__),'--worker',kind,
+                '-n',str(options.packets),'-l',str(options.links)]
+        output = subprocess.Popen(args,stdout=subprocess.PIPE).communicate()[0]
+        results[kind] = float(output)
+    print "peak RSS increase for %d queued TCP packets" % options.packets
+    print "dict packets:  %8.1f MB" % results['dict']
+    print "slot packets:  %8.1f MB" % results['slots']
+    print "reduction:     %8.1f%%" % (100*(1 - results['slots']/results['dict']))
@@ -0,0 +1,118 @@
+import sys
+sys.path.append('..')
+
+import imp
+import optparse
+import random
+import time
+
+# the module name has a dash in it, so it cannot be imported by name
+ls = imp.load_source('link_state','../src/link-state.py')
+
+def topology(nodes,degree,rng):
+    ''' Return the neighbors of each node of a random connected graph:
+        a random tree, plus random links until the average degree is
+        reached. '''
+    names = ['n%d' % i for i in range(nodes)]
+    neighbors = dict((name,{}) for name in names)
+    def connect(a,b):
+        neighbors[a][b] = 1
+        neighbors[b][a] = 1
+    for i in range(1,nodes):
+        connect(names[i],names[rng.randrange(i)])
+    while sum(len(n) for n in neighbors.values()) < degree*nodes:
+        a,b = rng.sample(names,2)
+        connect(a,b)
+    return names,neighbors
+
+def lsa(name,neighbors,sequence):
+    return {'hostname':name,'sequence':sequence,
+            'neighbors':dict(neighbors[name]),'addresses':[]}
+
+def install(database,lsa,incremental):
+    changed = database.install(lsa)
+    if incremental:
+        for start,end,old_cost,new_cost in changed:
+            database.update_link(start,end,old_cost,new_cost)
+    else:
+        database.spf()
+
+def run(nodes,degree,changes,seed):
+    ''' Build the database of one node of a random graph, then take
+        random links down and up again, keeping the shortest paths up to
+        date with full and with incremental SPF. Returns the seconds each
+        took and whether they always agreed. '''
+    rng = random.Random(seed)
+    names,neighbors = topology(nodes,degree,rng)
+    databases = {}
+    for incremental in [False,True]:
+        database = ls.LinkStateDatabase(names[0])
+        for name in names:
+            database.install(lsa(name,neighbors,1))
+        database.spf()
+        databases[incremental] = database
+
+    elapsed = {False:0,True:0}
+    agree = True
+    sequence = 1
+    links = [(a,b) for a in names for b in neighbors[a] if a < b]
+    for i in range(changes):
+        a,b = rng.choice(links)
+        sequence += 1
+        if b in neighbors[a]:
+            # take the link down
+            del neighbors[a][b]
+            del neighbors[b][a]
+        else:
+            neighbors[a][b] = 1
+            neighbors[b][a] = 1
+        # both ends flood a new lsa
+        for name in [a,b]:
+            for incremental,database in databases.items():
+                start = time.time()
+                install(database,lsa(name,neighbors,sequence),incremental)
+                elapsed[incremental] += time.time() - start
+        full = databases[False]
+        partial = databases[True]
+        if full.distance != partial.distance or not consistent(partial):
+            agree = False
+    return elapsed[False],elapsed[True],agree
+
+def consistent(database):
+    ''' Return true if every node in the shortest path tree is reached
+        from its parent over a link, and has the first hop of its
+        parent. '''
+    for name,parent in database.parent.items():
+        if parent is None:
+            continue
+        if database.distance[name] != database.distance[parent] + database.cost(parent,name):
+            return False
+        first = name if parent == database.root else database.first[parent]
+        if database.first.get(name) != first:
+            return False
+    return set(database.first) == set(database.distance) - set([database.root])
+
+if __name__ == '__main__':
+    parser = optparse.OptionParser(usage = "%prog [options]",
+                                   version = "%prog 0.1")
+    parser.add_option("-n","--nodes",type="str",dest="nodes",
+                      default='100,1000,5000',
+                      help="comma-separated numbers of nodes")
+    parser.add_option("-d","--degree",type="float",dest="degree",
+                      default=4,
+                      help="average number of neighbors of a node")
+    parser.add_option("-c","--changes",type="int",dest="changes",
+                      default=200,
+                      help="number of links to take down or bring up")
+    parser.add_option("-s","--seed",type="int",dest="seed",
+                      default=0,
+                      help="random seed")
+    (options,args) = parser.parse_args()
+
+    print "%8s %12s %12s %10s %8s" % ('nodes','full','incremental','speedup','agree')
+    for nodes in [int(nodes) for nodes in options.nodes.split(',')]:
+        full,incremental,agree = run(nodes,options.degree,options.changes,
+                                     options.seed)
+        print "%8d %11.3fs %11.3fs %9.1fx %8s" % (nodes,full,incremental,
+                                                 full/max(incremental,1e-9),
+                                                 agree)
@@ -0,0 +1,151 @@
+import sys
+sys.path.append('..')
+
+import optparse
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import time
+
+class Sink(object):
+    def __init__(self):
+        self.bytes = 0
+
+    def receive_packet(self,packet):
+        self.bytes += packet.length
+
+    def receive_data(self,data):
+        self.bytes += len(data)
+
+class Generator(object):
+    def __init__(self,node,destination,load,duration):
+        self.node = node
+        self.sim = node.sim
+        self.destination = destination
+        self.load = load
+        self.duration = duration
+        self.ident = 1
+
+    def handle(self,event):
+        if self.sim.scheduler.current_time() > self.duration:
+            return
+        from src import packet
+        self.ident += 1
+        p = packet.Packet(destination_address=self.destination,ident=self.ident,protocol='delay',length=1000)
+        self.sim.scheduler.add(delay=0, event=p, handler=self.node.send_packet)
+        self.sim.scheduler.add(delay=self.sim.random.expovariate(self.load), event='generate', handler=self.handle)
+
+def workload(root,duration,trace):
+    ''' Run a packet generator and a TCP connection over one link, using
+        the simulator found in root. Returns the number of events and the
+        elapsed time.'''
+    sys.path.insert(0,root)
+    from src.sim import Simulation
+    from src.transport import Transport
+    from src.tcp import TCP
+    from networks.network import Network
+
+    sim = Simulation(1)
+    if trace:
+        for kind in ('Link','Node','TCP'):
+            sim.set_debug(kind)
+    net = Network(os.path.join(root,'networks','one-hop.txt'),sim=sim)
+    net.loss(0)
+    n1 = net.get_node('n1')
+    n2 = net.get_node('n2')
+    n1.add_forwarding_entry(address=n2.get_address('n1'),link=n1.links[0])
+    n2.add_forwarding_entry(address=n1.get_address('n2'),link=n2.links[0])
+
+    # packet generator at 40% of the link rate
+    n2.add_protocol(protocol="delay",handler=Sink())
+    g = Generator(n1,n2.get_address('n1'),0.4*1000000/(1000*8),duration)
+    sim.scheduler.add(delay=0, event='generate', handler=g.handle)
+
+    # TCP connection sending a segment every 20 ms
+    t1 = Transport(n1)
+    t2 = Transport(n2)
+    sink = Sink()
+    c1 = TCP(t1,n1.get_address('n2'),1,n2.get_address('n1'),1,sink)
+    TCP(t2,n2.get_address('n1'),1,n1.get_address('n2'),1,sink)
+    for i in range(int(duration/0.02)):
+        sim.scheduler.add(delay=i*0.02, event='x'*1000, handler=c1.send)
+
+    start = time.time()
+    sim.scheduler.run()
+    elapsed = time.time() - start
+    return next(sim.scheduler.count),elapsed
+
+def strip(source,destination):
+    ''' Copy the simulator into destination with all trace calls
+        removed. Guards become "if 0:", which the compiler drops.'''
+    for directory in ('src','networks'):
+        shutil.copytree(os.path.join(source,directory),
+                        os.path.join(destination,directory))
+    directory = os.path.join(destination,'src')
+    for name in os.listdir(directory):
+        if not name.endswith('.py'):
+            continue
+        filename = os.path.join(directory,name)
+        with open(filename) as f:
+            text = f.read()
+        text = re.sub(r'self\.sim\.tracing\([^)]*\)','0',text)
+        text = re.sub(r'^(\s*)self\.trace\(.*\)$',r'\1pass',text,flags=re.M)
+        with open(filename,'w') as f:
+            f.write(text)
+
+def measure(root,options,trace=False):
+    ''' Run the workload in a new process and return the best events per
+        second over all repeats.'''
+    args = [sys.executable,os.path.abspath(__file__),'--worker',root,
+            '-d',str(options.duration)]
+    if trace:
+        args.append('--trace')
+    best = 0
+    for i in range(options.repeat):
+        output = subprocess.Popen(args,stdout=subprocess.PIPE).communicate()[0]
+        events,elapsed = output.split()
+        best = max(best,int(events)/float(elapsed))
+    return best
+
+if __name__ == '__main__':
+    parser = optparse.OptionParser(usage = "%prog [options]",
+                                   version = "%prog 0.1")
+    parser.add_option("-d","--duration",type="float",dest="duration",
+                      default=100,
+                      help="simulated time of each run in seconds")
+    parser.add_option("-r","--repeat",type="int",dest="repeat",
+                      default=3,
+                      help="number of runs of each build")
+    parser.add_option("--trace",action="store_true",dest="trace",
+                      default=False,
+                      help=optparse.SUPPRESS_HELP)
+    parser.add_option("--worker",type="str",dest="worker",
+                      default=None,
+                      help=optparse.SUPPRESS_HELP)
+    (options,args) = parser.parse_args()
+
+    if options.worker:
+        # keep simulator output off the pipe to the parent
+        stdout = sys.stdout
+        sys.stdout = open(os.devnull,'w')
+        events,elapsed = workload(options.worker,options.duration,options.trace)
+        stdout.write("%d %f\n" % (events,elapsed))
+        sys.exit(0)
+
+    root = os.path.abspath('..')
+    stripped = tempfile.mkdtemp()
+    try:
+        strip(root,stripped)
+        off = measure(root,options)
+        none = measure(stripped,options)
+        on = measure(root,options,trace=True)
+    finally:
+        shutil.rmtree(stripped)
+
+    print "events per second"
+    print "tracing off:    %10.0f" % off
+    print "trace stripped: %10.0f" % none
+    print "tracing on:     %10.0f" % on
+    print "tracing off is %.1f%% of stripped" % (100.0*off/none)
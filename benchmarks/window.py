@@ -0,0 +1,89 @@
+import sys
+sys.path.append('..')
+
+from src.sweep import Sweep
+from src.transport import Transport
+from src.tcp import TCP
+
+import optparse
+
+class Sink(object):
+    ''' Application that counts the bytes it receives. '''
+    def __init__(self,sim):
+        self.sim = sim
+        self.bytes = 0
+        self.finished = 0
+
+    def receive_data(self,data):
+        self.bytes += len(data)
+        self.finished = self.sim.scheduler.current_time()
+
+    def result(self):
+        # every event and timer takes the next number from the count
+        return {'bytes':self.bytes,'finished':self.finished,
+                'goodput':8.0*self.bytes/max(self.finished,1e-9),
+                'events':next(self.sim.scheduler.count)}
+
+def scenario(net,window,size,loss,delayed_ack,ack_every):
+    ''' Transfer size bytes from n1 to n2 with the given window and loss
+        rate, optionally with delayed ACKs. '''
+    net.loss(loss)
+
+    # setup routes
+    n1 = net.get_node('n1')
+    n2 = net.get_node('n2')
+    n1.add_forwarding_entry(address=n2.get_address('n1'),link=n1.links[0])
+    n2.add_forwarding_entry(address=n1.get_address('n2'),link=n2.links[0])
+
+    # setup transport
+    t1 = Transport(n1)
+    t2 = Transport(n2)
+
+    # setup connection
+    a = Sink(net.sim)
+    c1 = TCP(t1,n1.get_address('n2'),1,n2.get_address('n1'),1,a,window=window)
+    c2 = TCP(t2,n2.get_address('n1'),1,n1.get_address('n2'),1,a,window=window,
+             delayed_ack=delayed_ack,ack_every=ack_every)
+
+    net.sim.scheduler.add(delay=0, event='x'*size, handler=c1.send)
+    return a.result
+
+if __name__ == '__main__':
+    parser = optparse.OptionParser(usage = "%prog [options]",
+                                   version = "%prog 0.1")
+    parser.add_option("-p","--processes",type="int",dest="processes",
+                      default=None,
+                      help="number of worker processes")
+    parser.add_option("-w","--windows",type="str",dest="windows",
+                      default='1000,2000,4000,8000,16000,32000',
+                      help="comma-separated window sizes in bytes")
+    parser.add_option("-s","--size",type="int",dest="size",
+                      default=1000000,
+                      help="number of bytes to transfer")
+    parser.add_option("-l","--loss",type="float",dest="loss",
+                      default=0.0,
+                      help="random loss rate")
+    parser.add_option("-a","--delayed-ack",action="store_true",dest="delayed_ack",
+                      default=False,
+                      help="delay ACKs")
+    parser.add_option("-e","--ack-every",type="int",dest="ack_every",
+                      default=2,
+                      help="number of segments per delayed ACK")
+    (options,args) = parser.parse_args()
+
+    grid = {'window':[int(window) for window in options.windows.split(',')],
+            'size':[options.size],
+            'loss':[options.loss],
+            'delayed_ack':[options.delayed_ack],
+            'ack_every':[options.ack_every]}
+    sweep = Sweep('../networks/one-hop.txt',scenario,grid,
+                  processes=options.processes)
+    records = sorted(sweep.run(),key=lambda record: record['params']['window'])
+    print "%8s %13s %10s %10s %10s" % ('window','goodput','time','elapsed','events/kB')
+    for record in records:
+        result = record['result']
+        print "%8d %10.3f Mb %9.3fs %9.3fs %10.2f" % (record['params']['window'],
+                                                      result['goodput']/1000000,
+                                                      result['finished'],
+                                                      record['elapsed'],
+                                                      1000.0*result['events']/max(result['bytes'],1))
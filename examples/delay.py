@@ -43,10 +43,9 @@ if __name__ == '__main__':
     net = Network('../networks/one-hop.txt')
 
     # setup routes
+    net.install_routes()
     n1 = net.get_node('n1')
     n2 = net.get_node('n2')
-    n1.add_forwarding_entry(address=n2.get_address('n1'),link=n1.links[0])
-    n2.add_forwarding_entry(address=n1.get_address('n2'),link=n2.links[0])
 
     # setup app
     d = DelayHandler()
@@ -0,0 +1,90 @@
+import sys
+sys.path.append('..')
+
+from src import packet
+from src.sweep import Sweep
+
+import optparse
+
+class Generator(object):
+    def __init__(self,node,destination,load,duration):
+        self.node = node
+        self.sim = node.sim
+        self.destination = destination
+        self.load = load
+        self.duration = duration
+        self.start = 0
+        self.ident = 1
+
+    def handle(self,event):
+        # quit if done
+        now = self.sim.scheduler.current_time()
+        if (now - self.start) > self.duration:
+            return
+
+        # generate a packet
+        self.ident += 1
+        p = packet.Packet(destination_address=self.destination,ident=self.ident,protocol='delay',length=1000)
+        self.sim.scheduler.add(delay=0, event=p, handler=self.node.send_packet)
+        # schedule the next time we should generate a packet
+        self.sim.scheduler.add(delay=self.sim.random.expovariate(self.load), event='generate', handler=self.handle)
+
+class DelayHandler(object):
+    def __init__(self,sim):
+        self.sim = sim
+        self.count = 0
+        self.total = 0
+
+    def receive_packet(self,packet):
+        self.count += 1
+        self.total += self.sim.scheduler.current_time() - packet.created
+
+    def result(self):
+        return {'packets':self.count,'average_delay':self.total/max(self.count,1)}
+
+def scenario(net,utilization,loss,duration):
+    ''' Send packets from n1 to n2 at the given link utilization and
+        loss rate. '''
+    net.loss(loss)
+
+    # setup routes
+    n1 = net.get_node('n1')
+    n2 = net.get_node('n2')
+    n1.add_forwarding_entry(address=n2.get_address('n1'),link=n1.links[0])
+    n2.add_forwarding_entry(address=n1.get_address('n2'),link=n2.links[0])
+
+    # setup app
+    d = DelayHandler(net.sim)
+    n2.add_protocol(protocol="delay",handler=d)
+
+    # setup packet generator
+    max_rate = 1000000/(1000*8)
+    g = Generator(node=n1,destination=n2.get_address('n1'),
+                  load=utilization*max_rate,duration=duration)
+    net.sim.scheduler.add(delay=0, event='generate', handler=g.handle)
+    return d.result
+
+if __name__ == '__main__':
+    parser = optparse.OptionParser(usage = "%prog [options]",
+                                   version = "%prog 0.1")
+    parser.add_option("-p","--processes",type="int",dest="processes",
+                      default=None,
+                      help="number of worker processes")
+    parser.add_option("-n","--points",type="int",dest="points",
+                      default=20,
+                      help="number of utilization values to run")
+    parser.add_option("-l","--loss",type="float",dest="loss",
+                      default=0.0,
+                      help="random loss rate")
+    parser.add_option("-d","--duration",type="float",dest="duration",
+                      default=10,
+                      help="duration of each run in seconds")
+    (options,args) = parser.parse_args()
+
+    grid = {'utilization':[0.9*(i+1)/options.points for i in range(options.points)],
+            'loss':[options.loss],
+            'duration':[options.duration]}
+    sweep = Sweep('../networks/one-hop.txt',scenario,grid,
+                  processes=options.processes)
+    for record in sweep.run():
+        print record['params']['utilization'],record['params']['loss'],record['result']['packets'],record['result']['average_delay'],record['elapsed']
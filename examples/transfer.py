@@ -6,6 +6,7 @@ from src.node import Node
 from src.link import Link
 from src.transport import Transport
 from src.tcp import TCP
+from src.tracefile import TraceWriter
 
 from networks.network import Network
 
@@ -22,7 +23,7 @@ class AppHandler(object):
         self.f = open("%s/%s" % (self.directory,self.filename),'w')
 
     def receive_data(self,data):
-        Sim.trace('AppHandler',"application got %d bytes" % (len(data)))
+        Sim.trace('AppHandler',"application got %d bytes",len(data))
         self.f.write(data)
         self.f.flush()
 
@@ -45,9 +46,14 @@ class Main(object):
                           default=0.0,
                           help="random loss rate")
 
+        parser.add_option("-t","--tracefile",type="str",dest="tracefile",
+                          default=None,
+                          help="write a binary packet trace to this file")
+
         (options,args) = parser.parse_args()
         self.filename = options.filename
         self.loss = options.loss
+        self.tracefile = options.tracefile
 
     def diff(self):
         args = ['diff','-u',self.filename,self.directory+'/'+self.filename]
@@ -65,16 +71,17 @@ class Main(object):
         Sim.scheduler.reset()
         Sim.set_debug('AppHandler')
         Sim.set_debug('TCP')
+        if self.tracefile:
+            Sim.set_tracer(TraceWriter(self.tracefile))
 
         # setup network
         net = Network('../networks/one-hop.txt')
         net.loss(self.loss)
 
         # setup routes
+        net.install_routes()
         n1 = net.get_node('n1')
         n2 = net.get_node('n2')
-        n1.add_forwarding_entry(address=n2.get_address('n1'),link=n1.links[0])
-        n2.add_forwarding_entry(address=n1.get_address('n2'),link=n2.links[0])
 
         # setup transport
         t1 = Transport(n1)
@@ -97,6 +104,8 @@ class Main(object):
 
         # run the simulation
         Sim.scheduler.run()
+        if self.tracefile:
+            Sim.tracer.close()
 
 if __name__ == '__main__':
     m = Main()
@@ -1,29 +1,67 @@
+import collections
+import heapq
+import os
 import re
 import sys
 sys.path.append('..')
 
+from src import discipline
 from src import link
 from src import node
+from src.sim import Sim
+
+try:
+    import numpy
+    from scipy.sparse import csr_matrix
+    from scipy.sparse.csgraph import shortest_path
+except ImportError:
+    shortest_path = None
+
+# lines of each configuration file read so far, keyed by filename, so
+# that building the same network many times only reads it once
+configs = {}
+
+# routes computed so far, keyed by filename, modification time and
+# metric; see Network.install_routes
+routes = {}
+
+# cost of a link for each metric that routes can be computed with
+metrics = {'hops':lambda link: 1,
+           'delay':lambda link: link.propagation}
+
+# smallest number of nodes for which routes are computed with SciPy,
+# when it is installed
+SCIPY_NODES = 200
 
 class Network(object):
-    def __init__(self,config):
+    def __init__(self,config,sim=Sim):
         self.config = config
+        self.sim = sim
         self.nodes = {}
         self.address = 1
         self.build()
 
     def build(self):
         state = 'network'
-        with open(self.config) as f:
-            for line in f.readlines():
-                if line.startswith('#'):
-                    continue
-                if line == "\n":
-                    state = 'links'
-                if state == 'network':
-                    self.create_network(line)
-                elif state == 'links':
-                    self.configure_link(line)
+        for line in self.read_config():
+            if line.startswith('#'):
+                continue
+            if line == "\n":
+                state = 'links'
+            if state == 'network':
+                self.create_network(line)
+            elif state == 'links':
+                self.configure_link(line)
+
+    def read_config(self):
+        ''' Return the lines of the configuration file, reading it only
+            if it is new or has changed since it was last read.'''
+        key = os.path.abspath(self.config)
+        mtime = os.path.getmtime(key)
+        if key not in configs or configs[key][0] != mtime:
+            with open(key) as f:
+                configs[key] = (mtime,f.readlines())
+        return configs[key][1]
 
     def create_network(self,line):
         fields = line.split()
@@ -32,7 +70,7 @@ class Network(object):
         start = self.get_node(fields[0])
         for i in range(1,len(fields)):
             end = self.get_node(fields[i])
-            l = link.Link(self.address,start,endpoint=end)
+            l = link.Link(self.address,start,endpoint=end,sim=self.sim)
             self.address += 1
             start.add_link(l)
 
@@ -43,20 +81,141 @@ class Network(object):
         start = self.get_node(fields[0])
         l = start.get_link(fields[1])
         for i in range(2,len(fields)):
+            if fields[i] in discipline.disciplines:
+                l.set_discipline(discipline.disciplines[fields[i]]())
             if fields[i].endswith("bps"):
                 self.set_bandwidth(l,fields[i])
             if fields[i].endswith("ms"):
                 self.set_delay(l,fields[i])
             if fields[i].endswith("pkts"):
                 self.set_queue(l,fields[i])
+            if fields[i].endswith("bytes"):
+                self.set_queue_bytes(l,fields[i])
             if fields[i].endswith("loss"):
                 self.set_loss(l,fields[i])
                 
     def get_node(self,name):
         if name not in self.nodes:
-            self.nodes[name] = node.Node(name)
+            self.nodes[name] = node.Node(name,sim=self.sim)
         return self.nodes[name]
 
+    ## Routes ##
+
+    def install_routes(self,metric='hops'):
+        ''' Add forwarding entries to every node for every address of
+            every node it can reach, along the shortest path for the
+            metric, which is 'hops' to count links or 'delay' to add up
+            their propagation delays. Paths with hops are found with a
+            breadth-first search and paths with delays with Dijkstra's
+            algorithm, or with SciPy for large networks if it is
+            installed. The routes are cached for each configuration file
+            and metric, so building the same network again only installs
+            them. They follow the links as configured, so changes made
+            after the network was built are not taken into account.'''
+        key = os.path.abspath(self.config)
+        key = (key,configs[key][0],metric)
+        if key not in routes:
+            routes[key] = self.compute_routes(metric)
+        for hostname,entries in routes[key].iteritems():
+            node = self.nodes[hostname]
+            for address,index in entries:
+                node.add_forwarding_entry(address=address,link=node.links[index])
+
+    def compute_routes(self,metric):
+        ''' Return the forwarding entries of each node for the metric,
+            as a dictionary mapping each hostname to a list of (address,
+            link index) pairs. '''
+        cost = metrics[metric]
+        names = sorted(self.nodes.keys())
+        # cost and index of the cheapest link from each node to each of
+        # its neighbors
+        edges = {}
+        for name in names:
+            for index,l in enumerate(self.nodes[name].links):
+                pair = (name,l.endpoint.hostname)
+                if pair not in edges or cost(l) < edges[pair][0]:
+                    edges[pair] = (cost(l),index)
+
+        if shortest_path is not None and len(names) >= SCIPY_NODES and \
+           all(c > 0 for c,index in edges.itervalues()):
+            next_hops = self.vectorized_next_hops(names,edges,metric)
+        else:
+            next_hops = self.next_hops(names,edges,metric)
+
+        entries = {}
+        for source,hops in next_hops.iteritems():
+            entries[source] = []
+            for destination,neighbor in hops.iteritems():
+                index = edges[(source,neighbor)][1]
+                for address in self.nodes[destination].addresses:
+                    entries[source].append((address,index))
+        return entries
+
+    def next_hops(self,names,edges,metric):
+        ''' Return a dictionary mapping each hostname to a dictionary of
+            the neighbor to send to for each node it can reach. '''
+        # neighbors of each node over its cheapest links, in link order
+        neighbors = {}
+        for name in names:
+            neighbors[name] = []
+            for index,l in enumerate(self.nodes[name].links):
+                c,best = edges[(name,l.endpoint.hostname)]
+                if best == index:
+                    neighbors[name].append((l.endpoint.hostname,c))
+
+        next_hops = {}
+        for source in names:
+            first = {source:None}
+            if metric == 'hops':
+                queue = collections.deque([source])
+                while queue:
+                    current = queue.popleft()
+                    for neighbor,c in neighbors[current]:
+                        if neighbor not in first:
+                            first[neighbor] = first[current] or neighbor
+                            queue.append(neighbor)
+            else:
+                distance = {source:0}
+                done = set()
+                heap = [(0,source)]
+                while heap:
+                    d,current = heapq.heappop(heap)
+                    if current in done:
+                        continue
+                    done.add(current)
+                    for neighbor,c in neighbors[current]:
+                        if neighbor not in distance or d + c < distance[neighbor]:
+                            distance[neighbor] = d + c
+                            first[neighbor] = first[current] or neighbor
+                            heapq.heappush(heap,(d + c,neighbor))
+            del first[source]
+            next_hops[source] = first
+        return next_hops
+
+    def vectorized_next_hops(self,names,edges,metric):
+        ''' Like next_hops, using SciPy. Paths are found on the graph
+            with every link reversed, so that the predecessor of a node
+            on the path from a destination is its next hop towards that
+            destination. '''
+        numbers = dict((name,i) for i,name in enumerate(names))
+        rows = []
+        columns = []
+        costs = []
+        for (start,end),(c,index) in edges.iteritems():
+            rows.append(numbers[end])
+            columns.append(numbers[start])
+            costs.append(c)
+        graph = csr_matrix((costs,(rows,columns)),shape=(len(names),len(names)))
+        distances,predecessors = shortest_path(graph,method='D',
+                                               unweighted=(metric == 'hops'),
+                                               return_predecessors=True)
+        next_hops = dict((name,{}) for name in names)
+        for j,destination in enumerate(names):
+            row = predecessors[j]
+            for i in numpy.flatnonzero(row >= 0):
+                next_hops[names[i]][destination] = names[row[i]]
+        return next_hops
+
     def loss(self,loss):
         for node in self.nodes.values():
             for link in node.links:
@@ -83,6 +242,15 @@ class Network(object):
         if size.endswith("pkts"):
             link.queue_size = numeric_size
 
+    def set_queue_bytes(self,link,size):
+        numeric_size = self.convert(size)
+        if size.endswith("Mbytes"):
+            link.queue_bytes = numeric_size * 1000000
+        elif size.endswith("Kbytes"):
+            link.queue_bytes = numeric_size * 1000
+        elif size.endswith("bytes"):
+            link.queue_bytes = numeric_size
+
     def set_loss(self,link,loss):
         numeric_loss = self.convert(loss)
         if loss.endswith("loss"):
@@ -1,12 +1,18 @@
+import bisect
+
 class SendBuffer(object):
     ''' Send buffer for transport protocols '''
-    def __init__(self):
+    def __init__(self,capacity=0):
         ''' The buffer holds a series of characters to send. The base
             is the starting sequence number of the buffer. The next
             value is the sequence number for the next data that has
             not yet been sent. The last value is the sequence number
-            for the last data in the buffer.'''
-        self.buffer = ''
+            for the last data in the buffer. Data is returned as
+            memoryview slices that stay valid as the buffer grows.'''
+        self.buffer = bytearray(capacity)
+        self.view = memoryview(self.buffer)
+        self.start = 0
+        self.end = 0
         self.base = 0
         self.next = 0
         self.last = 0
@@ -23,8 +29,23 @@ class SendBuffer(object):
 
     def put(self,data):
         ''' Put some data into the buffer '''
-        self.buffer += data
-        self.last += len(data)
+        size = len(data)
+        if self.end + size > len(self.buffer):
+            self.grow(size)
+        self.buffer[self.end:self.end+size] = data
+        self.end += size
+        self.last += size
+
+    def grow(self,size):
+        ''' Move the data in the buffer to a new bytearray with room for
+            at least size more bytes.'''
+        length = self.end - self.start
+        buffer = bytearray(max(2*(length + size),len(self.buffer)))
+        buffer[0:length] = self.view[self.start:self.end]
+        self.buffer = buffer
+        self.view = memoryview(self.buffer)
+        self.start = 0
+        self.end = length
 
     def get(self,size):
         ''' Get the next data that has not been sent yet. Return the
@@ -33,8 +54,8 @@ class SendBuffer(object):
             be less.'''
         if self.next + size > self.last:
             size = self.last - self.next
-        start = self.next - self.base
-        data = self.buffer[start:start+size]
+        start = self.start + self.next - self.base
+        data = self.view[start:start+size]
         sequence = self.next
         self.next = self.next + size
         return data,sequence
@@ -46,14 +67,23 @@ class SendBuffer(object):
         bytes but may be less. If reset is true, then all other data
         that was outstanding is now treated as if it was never sent. This
         is standard practice for TCP when retransmitting.'''
-        if self.base + size > self.last:
-            size = self.last - self.base
-        data = self.buffer[:size]
+        data = self.peek(self.base,size)
         sequence = self.base
+        size = len(data)
         if reset:
             self.next = sequence + size
         return data,sequence
 
+    def peek(self,sequence,size):
+        ''' Get the data starting at a sequence number that is in the
+            buffer, without changing what is treated as sent. The total
+            amount of data returned is at most size bytes but may be
+            less.'''
+        if sequence + size > self.last:
+            size = self.last - sequence
+        start = self.start + sequence - self.base
+        return self.view[start:start+size]
+
     def slide(self,sequence):
         ''' Slide the receive window to the acked sequence
             number. This sequence number represents the lowest
@@ -61,75 +91,102 @@ class SendBuffer(object):
             ACK is for all data less than but not equal to this
             sequence number.'''
         acked = sequence - self.base
-        self.buffer = self.buffer[acked:]
+        self.start += acked
         self.base = sequence
         # adjust next in case we slide past it
         if self.next < self.base:
             self.next = self.base
 
-class Chunk(object):
-    ''' Chunk of data stored in receive buffer. '''
-    def __init__(self,data,sequence):
-        self.data = data
-        self.length = len(data)
-        self.sequence = sequence
-
-    def trim(self,sequence,length):
-        ''' Check for overlap with a previous chunk and trim this chunk
-            if needed.'''
-        # check for overlap
-        if self.sequence < sequence + length:
-            self.data = self.data[sequence+length:]
-            self.length = len(self.data)
-            self.sequence = sequence + length
-
 class ReceiveBuffer(object):
     ''' Receive buffer for transport protocols '''
     def __init__(self):
-        ''' The buffer holds all the data that has been received,
-            indexed by starting sequence number. Data may come in out
-            of order, so this buffer will order them. Data may also be
-            duplicated, so this buffer will remove any duplicate
-            bytes.'''
-        self.buffer = {}
+        ''' The buffer holds all the data that has been received but
+            not yet read. Data may come in out of order, so this buffer
+            will order them. Data may also be duplicated, so this buffer
+            will remove any duplicate bytes.'''
+        # sorted ranges of data that do not touch: range i is from
+        # starts[i] up to ends[i], and chunks[i] is its list of pieces
+        self.starts = []
+        self.ends = []
+        self.chunks = []
+        # ranges before head have been read
+        self.head = 0
         # starting sequence number
         self.base = 0
 
     def put(self,data,sequence):
         ''' Add data to the receive buffer. Put it in order of
         sequence number and remove any duplicate data.'''
-        # ignore old chunk
+        # ignore old data
         if sequence < self.base:
+            data = data[self.base - sequence:]
+            sequence = self.base
+        end = sequence + len(data)
+        if end <= sequence:
+            return
+        # find the ranges that overlap or touch this data
+        i = bisect.bisect_right(self.starts,sequence,self.head) - 1
+        if i < self.head or self.ends[i] < sequence:
+            i += 1
+        j = bisect.bisect_right(self.starts,end,self.head)
+        if i == j:
+            self.starts.insert(i,sequence)
+            self.ends.insert(i,end)
+            self.chunks.insert(i,[data])
             return
-        # ignore duplicate chunk
-        if sequence in self.buffer:
-            if self.buffer[sequence].length >= len(data):
-                return
-        self.buffer[sequence] = Chunk(data,sequence)
-        # remove overlapping data
-        next = -1
-        length = 0
+        if j == i + 1:
+            # the data only extends one range, so add to its pieces
+            pieces = self.chunks[i]
+            if sequence < self.starts[i]:
+                pieces.insert(0,data[:self.starts[i] - sequence])
+                self.starts[i] = sequence
+            if end > self.ends[i]:
+                pieces.append(data[self.ends[i] - sequence:])
+                self.ends[i] = end
+            return
+        # fill the gaps between the ranges with the new data
+        pieces = []
+        position = sequence
+        for k in range(i,j):
+            if self.starts[k] > position:
+                pieces.append(data[position - sequence:self.starts[k] - sequence])
+            pieces.extend(self.chunks[k])
+            position = max(position,self.ends[k])
+        if end > position:
+            pieces.append(data[position - sequence:])
+            position = end
+        self.starts[i:j] = [min(sequence,self.starts[i])]
+        self.ends[i:j] = [position]
+        self.chunks[i:j] = [pieces]
 
-        for sequence in sorted(self.buffer.keys()):
-            chunk = self.buffer[sequence]
-            # trim chunk if there is duplicate data from the previous chunk
-            chunk.trim(next,length)
-            if chunk.length == 0:
-                # remove chunk
-                del self.buffer[sequence]
-            next = chunk.sequence
-            length = len(chunk.data)
-        
     def get(self):
         ''' Get and remove all data that is in order. Return the data
-            and its starting sequence number. '''
-        data = ''
+            and its starting sequence number. The data is a bytearray,
+            which compares equal to a str with the same bytes but cannot
+            be used as a dictionary key; use str(data) where a str is
+            needed. '''
         start = self.base
-        for sequence in sorted(self.buffer.keys()):
-            chunk = self.buffer[sequence]
-            if chunk.sequence == self.base:
-                # append the data, adjust the base, delete the chunk
-                data += chunk.data
-                self.base += chunk.length
-                del self.buffer[chunk.sequence]
+        head = self.head
+        if head == len(self.starts) or self.starts[head] != self.base:
+            return bytearray(),start
+        end = self.ends[head]
+        pieces = self.chunks[head]
+        self.chunks[head] = None
+        self.head = head + 1
+        if 2*self.head >= len(self.starts):
+            del self.starts[:self.head]
+            del self.ends[:self.head]
+            del self.chunks[:self.head]
+            self.head = 0
+        data = bytearray(end - start)
+        offset = 0
+        for piece in pieces:
+            data[offset:offset+len(piece)] = piece
+            offset += len(piece)
+        self.base = end
         return data,start
+
+    def blocks(self):
+        ''' Return the ranges of data received out of order, as a list
+            of (start, end) sequence numbers.'''
+        return zip(self.starts[self.head:],self.ends[self.head:])
@@ -0,0 +1,287 @@
+import collections
+
+class Congestion(object):
+    ''' Base class for congestion control (RFC 5681). The connection
+        sends no more than the smaller of cwnd, in bytes, and its own
+        window, and calls the methods below as ACKs and losses arrive.'''
+    def __init__(self,initial_window=1):
+        # initial window in segments
+        self.initial_window = initial_window
+        self.tcp = None
+        self.mss = 0
+        self.cwnd = 0
+        self.ssthresh = float('inf')
+        self.history = []
+
+    def attach(self,tcp):
+        self.tcp = tcp
+        self.mss = tcp.mss
+        self.cwnd = self.initial_window*self.mss
+        self.record(tcp.sim.scheduler.current_time())
+
+    def record(self,now):
+        ''' Add the time, cwnd and smoothed RTT to history. '''
+        self.history.append((now,self.cwnd,self.tcp.srtt))
+
+    def acked(self,now,acked,rtt):
+        ''' An ACK covered acked new bytes outside of loss recovery;
+            rtt is the RTT sample it gave, or None. '''
+        raise NotImplementedError
+
+    def loss(self,now):
+        ''' Three duplicate ACKs started a fast retransmit. '''
+        raise NotImplementedError
+
+    def duplicate(self,now):
+        ''' Another duplicate ACK arrived during recovery. '''
+        pass
+
+    def partial(self,now,acked):
+        ''' An ACK covered some of the data outstanding when recovery
+            started. Return False to end recovery. '''
+        return True
+
+    def recovered(self,now):
+        ''' All the data outstanding when recovery started is acked. '''
+        pass
+
+    def timeout(self,now):
+        ''' The retransmission timer fired. '''
+        raise NotImplementedError
+
+class Reno(Congestion):
+    ''' TCP Reno (RFC 5681), with byte counting in slow start and
+        congestion avoidance (RFC 3465). A new ACK ends recovery.'''
+    def __init__(self,initial_window=1):
+        Congestion.__init__(self,initial_window)
+        # the threshold was last lowered when this was the highest
+        # sequence number sent
+        self.reduced = 0
+
+    def acked(self,now,acked,rtt):
+        if self.cwnd < self.ssthresh:
+            self.cwnd += min(acked,2*self.mss)
+        else:
+            self.cwnd += float(self.mss)*acked/self.cwnd
+
+    def reduce(self,now):
+        ''' Lower the slow start threshold after a loss, unless the lost
+            data was sent before it was last lowered. '''
+        if self.tcp.sequence < self.reduced:
+            return
+        self.reduced = self.tcp.highest
+        self.ssthresh = self.threshold(now)
+
+    def threshold(self,now):
+        ''' Return the slow start threshold after a loss. '''
+        return max(self.tcp.send_buffer.outstanding()/2.0,2*self.mss)
+
+    def loss(self,now):
+        self.reduce(now)
+        self.cwnd = self.ssthresh + 3*self.mss
+
+    def duplicate(self,now):
+        self.cwnd += self.mss
+
+    def partial(self,now,acked):
+        self.cwnd = self.ssthresh
+        return False
+
+    def recovered(self,now):
+        self.cwnd = self.ssthresh
+
+    def timeout(self,now):
+        self.reduce(now)
+        self.cwnd = self.mss
+
+class NewReno(Reno):
+    ''' TCP NewReno (RFC 6582). Recovery lasts until all the data
+        outstanding when it started is acked.'''
+    def partial(self,now,acked):
+        self.cwnd -= acked
+        if acked >= self.mss:
+            self.cwnd += self.mss
+        return True
+
+    def recovered(self,now):
+        self.cwnd = min(self.ssthresh,
+                        self.tcp.send_buffer.outstanding() + self.mss)
+        self.cwnd = max(self.cwnd,self.mss)
+
+class CUBIC(NewReno):
+    ''' CUBIC (RFC 8312), with the TCP-friendly region and fast
+        convergence.'''
+    def __init__(self,initial_window=1,c=0.4,beta=0.7,fast_convergence=True):
+        NewReno.__init__(self,initial_window)
+        self.c = c
+        self.beta = beta
+        self.fast_convergence = fast_convergence
+        # window before the last loss, in bytes
+        self.w_max = 0
+        # start of the current congestion avoidance epoch, the window
+        # the cubic function is centered on, the time it takes to get
+        # there, and the window Reno would have
+        self.epoch = None
+        self.origin = 0
+        self.k = 0
+        self.w_est = 0
+
+    def acked(self,now,acked,rtt):
+        if self.cwnd < self.ssthresh:
+            self.cwnd += min(acked,2*self.mss)
+            return
+        if self.epoch is None:
+            self.epoch = now
+            if self.cwnd < self.w_max:
+                self.k = ((self.w_max - self.cwnd)/self.mss/self.c)**(1/3.0)
+                self.origin = self.w_max
+            else:
+                self.k = 0
+                self.origin = self.cwnd
+            self.w_est = self.cwnd
+        t = now - self.epoch + (self.tcp.srtt or 0)
+        target = self.origin + self.c*(t - self.k)**3*self.mss
+        self.w_est += 3*(1 - self.beta)/(1 + self.beta)*self.mss*acked/self.cwnd
+        target = max(target,self.w_est)
+        if target > self.cwnd:
+            self.cwnd += (target - self.cwnd)*acked/self.cwnd
+
+    def threshold(self,now):
+        self.epoch = None
+        if self.fast_convergence and self.cwnd < self.w_max:
+            self.w_max = self.cwnd*(1 + self.beta)/2
+        else:
+            self.w_max = self.cwnd
+        return max(self.cwnd*self.beta,2*self.mss)
+
+class BBR(Congestion):
+    ''' A simplified BBR (Cardwell et al., "BBR: Congestion-Based
+        Congestion Control", ACM Queue 2016). There is no pacing, so the
+        window alone limits the sending rate.'''
+    gains = [1.25,0.75,1,1,1,1,1,1]
+    startup_gain = 2.89
+
+    def __init__(self,initial_window=1,cwnd_gain=2,rounds=10,rt_window=10,
+                 probe_time=0.2):
+        Congestion.__init__(self,initial_window)
+        self.cwnd_gain = cwnd_gain
+        self.rounds = rounds
+        self.rt_window = rt_window
+        self.probe_time = probe_time
+        # startup, drain, probe_bw or probe_rtt
+        self.mode = 'startup'
+        # bottleneck bandwidth in bytes per second, and the rate samples
+        # of the last rounds as (round, rate)
+        self.btl_bw = 0
+        self.rates = collections.deque()
+        # round-trip propagation delay and when it was measured
+        self.rt_prop = None
+        self.rt_stamp = 0
+        # bytes delivered, with (time, delivered) samples covering about
+        # one round trip to measure the delivery rate
+        self.delivered = 0
+        self.samples = collections.deque()
+        # round trips counted by ACKs passing the highest sequence number
+        # sent when the round started
+        self.round = 0
+        self.round_end = 0
+        # bandwidth at the last time it grew by 25%, and the number of
+        # rounds since then
+        self.full_bw = 0
+        self.full_count = 0
+        self.cycle = 0
+        # ACKs up to this sequence number cover data held back by a loss,
+        # so they do not measure the delivery rate
+        self.repaired = 0
+        # smallest RTT seen in probe_rtt, and when probe_rtt ends
+        self.probe_rtt = None
+        self.probe_end = None
+
+    def acked(self,now,acked,rtt):
+        self.delivered += acked
+        if rtt is not None:
+            if self.rt_prop is None or rtt <= self.rt_prop:
+                self.rt_prop = rtt
+                self.rt_stamp = now
+            if self.mode == 'probe_rtt' and (self.probe_rtt is None or rtt < self.probe_rtt):
+                self.probe_rtt = rtt
+        self.sample(now)
+        if self.tcp.sequence >= self.round_end:
+            self.round += 1
+            self.round_end = self.tcp.highest
+            self.new_round()
+        if not self.btl_bw:
+            self.cwnd += acked
+            return
+        if self.mode == 'startup':
+            bdp = self.btl_bw*self.rt_prop
+            self.cwnd = max(min(self.cwnd + acked,self.startup_gain*bdp),4*self.mss)
+            return
+        if self.mode != 'probe_rtt' and now - self.rt_stamp > self.rt_window:
+            self.mode = 'probe_rtt'
+            self.probe_rtt = None
+            self.probe_end = None
+        if self.mode == 'probe_rtt':
+            self.cwnd = 4*self.mss
+            if self.probe_end is None:
+                if self.tcp.send_buffer.outstanding() <= self.cwnd:
+                    self.probe_end = now + self.probe_time
+                return
+            if now < self.probe_end:
+                return
+            if self.probe_rtt is not None:
+                self.rt_prop = self.probe_rtt
+            self.rt_stamp = now
+            self.mode = 'probe_bw'
+            self.cycle = 0
+        bdp = self.btl_bw*self.rt_prop
+        if self.mode == 'drain':
+            self.cwnd = bdp
+            if self.tcp.send_buffer.outstanding() <= bdp:
+                self.mode = 'probe_bw'
+                self.cycle = 0
+        if self.mode == 'probe_bw':
+            self.cwnd = self.cwnd_gain*self.gains[self.cycle]*bdp
+        self.cwnd = max(self.cwnd,4*self.mss)
+
+    def sample(self,now):
+        ''' Add a delivery rate sample over the last round trip. '''
+        if self.tcp.sequence <= self.repaired:
+            self.samples.clear()
+        self.samples.append((now,self.delivered))
+        if self.tcp.srtt is None:
+            return
+        while len(self.samples) > 2 and now - self.samples[1][0] >= self.tcp.srtt:
+            self.samples.popleft()
+        start,delivered = self.samples[0]
+        if now <= start:
+            return
+        rate = (self.delivered - delivered)/(now - start)
+        while self.rates and self.rates[-1][1] <= rate:
+            self.rates.pop()
+        self.rates.append((self.round,rate))
+        while self.rates[0][0] <= self.round - self.rounds:
+            self.rates.popleft()
+        self.btl_bw = self.rates[0][1]
+
+    def new_round(self):
+        if self.mode == 'startup':
+            if self.btl_bw >= 1.25*self.full_bw:
+                self.full_bw = self.btl_bw
+                self.full_count = 0
+            else:
+                self.full_count += 1
+                if self.full_count >= 3:
+                    self.mode = 'drain'
+        elif self.mode == 'probe_bw':
+            self.cycle = (self.cycle + 1) % len(self.gains)
+
+    def loss(self,now):
+        self.repaired = self.tcp.highest
+
+    def timeout(self,now):
+        self.repaired = self.tcp.highest
+        self.cwnd = self.mss
+
+# algorithms that can be chosen by name
+algorithms = {'reno':Reno,'newreno':NewReno,'cubic':CUBIC,'bbr':BBR}
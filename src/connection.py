@@ -1,3 +1,5 @@
+from transport import flow_id
+
 class Connection(object):
     ''' A transport connection between two hosts. '''
     def __init__(self,transport,source_address,source_port,
@@ -9,8 +11,13 @@ class Connection(object):
         self.destination_address = destination_address
         self.destination_port = destination_port
         self.node = self.transport.node
+        self.sim = self.transport.sim
+        # binding checks that the addresses and ports fit in a flow id
         self.transport.bind(self,source_address,source_port,
                             destination_address,destination_port)
+        # flow id of the packets this connection sends
+        self.flow = flow_id(source_address,source_port,
+                            destination_address,destination_port)
         # setup application delivery
         self.app = app
 
@@ -0,0 +1,271 @@
+import collections
+import math
+
+class Discipline(object):
+    ''' A queue discipline decides which packets a link queues, drops
+        and sends next. The link enforces its own packet and byte limits
+        before calling enqueue; enqueue returns False if the discipline
+        drops the packet instead of queueing it. Disciplines that drop
+        packets when dequeuing report them with link.drop. The number of
+        packets queued is given by len() and the number of bytes by the
+        bytes attribute. All operations are O(1) amortized, except for
+        Priority, which is O(number of bands).'''
+    def __init__(self):
+        self.link = None
+        self.bytes = 0
+
+    def attach(self,link):
+        self.link = link
+
+    def __len__(self):
+        raise NotImplementedError
+
+    def enqueue(self,packet,now):
+        raise NotImplementedError
+
+    def dequeue(self,now):
+        raise NotImplementedError
+
+class DropTail(Discipline):
+    ''' First-in, first-out queue that only drops when the link's queue
+        is full.'''
+    def __init__(self):
+        Discipline.__init__(self)
+        self.queue = collections.deque()
+
+    def __len__(self):
+        return len(self.queue)
+
+    def enqueue(self,packet,now):
+        self.queue.append(packet)
+        self.bytes += packet.length
+        return True
+
+    def dequeue(self,now):
+        if not self.queue:
+            return None
+        packet = self.queue.popleft()
+        self.bytes -= packet.length
+        return packet
+
+class RED(DropTail):
+    ''' Random Early Detection. The average queue length in packets is
+        an exponentially weighted moving average with the given weight.
+        Below min_threshold no packets are dropped early; between the
+        thresholds packets are dropped with a probability that rises to
+        max_p, spread out by the count of packets since the last drop;
+        above max_threshold every packet is dropped, or, in gentle mode,
+        the probability rises from max_p to 1 at twice max_threshold.
+        While the queue is idle the average decays as if packets of
+        mean_size bytes had been sent.'''
+    def __init__(self,min_threshold=5,max_threshold=15,max_p=0.1,
+                 weight=0.002,gentle=True,mean_size=1000):
+        DropTail.__init__(self)
+        self.min_threshold = min_threshold
+        self.max_threshold = max_threshold
+        self.max_p = max_p
+        self.weight = weight
+        self.gentle = gentle
+        self.mean_size = mean_size
+        self.average = 0.0
+        # packets since the last early drop
+        self.count = -1
+        # time the queue became empty
+        self.idle = None
+
+    def enqueue(self,packet,now):
+        if self.queue:
+            self.average += self.weight*(len(self.queue) - self.average)
+        else:
+            # decay for the packets that could have been sent while the
+            # queue was idle, and for this one arriving to an empty queue
+            sent = 0
+            if self.idle is not None:
+                sent = (now - self.idle)*self.link.bandwidth/(8.0*self.mean_size)
+            self.average *= (1 - self.weight)**(sent + 1)
+        if self.drop_early():
+            self.count = 0
+            if not self.queue:
+                # the queue stays idle; the decay up to now is counted
+                self.idle = now
+            return False
+        self.idle = None
+        return DropTail.enqueue(self,packet,now)
+
+    def drop_early(self):
+        if self.average < self.min_threshold:
+            self.count = -1
+            return False
+        if self.average >= self.max_threshold:
+            if not self.gentle or self.average >= 2*self.max_threshold:
+                return True
+            p = self.max_p + (1 - self.max_p)*(self.average - self.max_threshold)/self.max_threshold
+        else:
+            p = self.max_p*(self.average - self.min_threshold)/(self.max_threshold - self.min_threshold)
+        self.count += 1
+        if self.count*p >= 1:
+            return True
+        p = p/(1 - self.count*p)
+        return self.link.sim.random.random() < p
+
+    def dequeue(self,now):
+        packet = DropTail.dequeue(self,now)
+        if not self.queue:
+            self.idle = now
+        return packet
+
+class CoDel(DropTail):
+    ''' Controlled Delay (RFC 8289). Packets are dropped at the head of
+        the queue once their time in the queue has stayed above target
+        for at least interval seconds. While dropping, the time between
+        drops shrinks with the square root of the number of drops.'''
+    def __init__(self,target=0.005,interval=0.1,mtu=1500):
+        DropTail.__init__(self)
+        self.target = target
+        self.interval = interval
+        self.mtu = mtu
+        self.first_above_time = 0
+        self.drop_next = 0
+        self.count = 0
+        self.last_count = 0
+        self.dropping = False
+
+    def control_law(self,time):
+        return time + self.interval/math.sqrt(self.count)
+
+    def head(self,now):
+        ''' Remove the packet at the head of the queue. Returns the packet
+            and whether the queueing delay allows it to be dropped.'''
+        packet = DropTail.dequeue(self,now)
+        if packet is None:
+            self.first_above_time = 0
+            return None,False
+        if now - packet.enter_queue < self.target or self.bytes <= self.mtu:
+            self.first_above_time = 0
+            return packet,False
+        if self.first_above_time == 0:
+            self.first_above_time = now + self.interval
+            return packet,False
+        return packet,now >= self.first_above_time
+
+    def dequeue(self,now):
+        packet,ok_to_drop = self.head(now)
+        if packet is None:
+            self.dropping = False
+            return None
+        if self.dropping:
+            if not ok_to_drop:
+                self.dropping = False
+            while self.dropping and now >= self.drop_next:
+                self.link.drop(packet,"CoDel")
+                self.count += 1
+                packet,ok_to_drop = self.head(now)
+                if packet is None:
+                    self.dropping = False
+                    return None
+                if not ok_to_drop:
+                    self.dropping = False
+                else:
+                    self.drop_next = self.control_law(self.drop_next)
+        elif ok_to_drop:
+            self.link.drop(packet,"CoDel")
+            packet,ok_to_drop = self.head(now)
+            self.dropping = True
+            delta = self.count - self.last_count
+            if delta > 1 and now - self.drop_next < 16*self.interval:
+                self.count = delta
+            else:
+                self.count = 1
+            self.drop_next = self.control_law(now)
+            self.last_count = self.count
+        return packet
+
+def flow(packet):
+    ''' Default flow classifier: the addresses and ports of a packet. '''
+    return (packet.source_address,packet.source_port,
+            packet.destination_address,packet.destination_port)
+
+class DRR(Discipline):
+    ''' Deficit Round Robin fair queueing. Each flow, as given by the
+        classifier, has its own queue; active flows are served in turn,
+        each sending up to quantum bytes per round.'''
+    def __init__(self,quantum=1500,classifier=flow):
+        Discipline.__init__(self)
+        self.quantum = quantum
+        self.classifier = classifier
+        self.queues = {}
+        self.deficits = {}
+        self.active = collections.deque()
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def enqueue(self,packet,now):
+        key = self.classifier(packet)
+        queue = self.queues.get(key)
+        if queue is None:
+            queue = self.queues[key] = collections.deque()
+            self.deficits[key] = 0
+            self.active.append(key)
+        queue.append(packet)
+        self.count += 1
+        self.bytes += packet.length
+        return True
+
+    def dequeue(self,now):
+        while self.active:
+            key = self.active[0]
+            queue = self.queues[key]
+            if self.deficits[key] < queue[0].length:
+                self.deficits[key] += self.quantum
+                self.active.rotate(-1)
+                continue
+            packet = queue.popleft()
+            self.deficits[key] -= packet.length
+            if not queue:
+                self.active.popleft()
+                del self.queues[key]
+                del self.deficits[key]
+            self.count -= 1
+            self.bytes -= packet.length
+            return packet
+        return None
+
+def priority(packet):
+    ''' Default priority classifier: the priority field of a packet,
+        where 0 is the highest priority.'''
+    return packet.priority
+
+class Priority(Discipline):
+    ''' Strict priority queueing. Packets are placed into one of bands
+        FIFO queues by the classifier, and a packet is only sent from a
+        band when all higher priority bands are empty.'''
+    def __init__(self,bands=3,classifier=priority):
+        Discipline.__init__(self)
+        self.classifier = classifier
+        self.queues = [collections.deque() for i in range(bands)]
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def enqueue(self,packet,now):
+        band = min(max(self.classifier(packet),0),len(self.queues) - 1)
+        self.queues[band].append(packet)
+        self.count += 1
+        self.bytes += packet.length
+        return True
+
+    def dequeue(self,now):
+        for queue in self.queues:
+            if queue:
+                packet = queue.popleft()
+                self.count -= 1
+                self.bytes -= packet.length
+                return packet
+        return None
+
+# disciplines that can be named in a network configuration file
+disciplines = {'droptail':DropTail,'red':RED,'codel':CoDel,'drr':DRR,
+               'priority':Priority}
@@ -5,9 +5,13 @@ from src.sim import Sim
 from src import node
 from src import link
 from src import packet
+from src.observer import PrintObserver,printable_body
 
 from networks.network import Network
 
+# cost that means a destination cannot be reached
+INFINITY = 16
+
 class RoutingTable(object):
     def __init__(self):
         # format for data: {destination_address: [cost, link_address]}
@@ -16,11 +20,26 @@ class RoutingTable(object):
         # format: {neighbor_hostname: {destination_address: cost}}
         self.neighbor_routing_tables = {}
 
-    def get_routing_table(self):
+        # destinations in hold-down; they are treated as unreachable
+        # until they are released
+        self.held = set()
+
+    def get_routing_table(self, link=None, destinations=None):
         # format: {destination_address: cost}
+        # with a link, routes that use it are advertised with a cost of
+        # INFINITY (split horizon with poison reverse); with destinations,
+        # only those are included, and any we have no route to are
+        # advertised with a cost of INFINITY
         output_table = dict()
-        for destination_address, entry in self.routing_table.iteritems():
-            output_table[destination_address] = entry[0]
+        if destinations is None:
+            destinations = self.routing_table
+
+        for destination_address in destinations:
+            entry = self.routing_table.get(destination_address)
+            if entry is None or (link is not None and entry[1] is link):
+                output_table[destination_address] = INFINITY
+            else:
+                output_table[destination_address] = entry[0]
 
         return output_table
 
@@ -47,133 +66,253 @@ class RoutingTable(object):
 
     # handle neighbor routing tables
 
-    def upsert_neighbor_routing_table(self, hostname, neighbor_routing_table):
-        self.neighbor_routing_tables[hostname] = neighbor_routing_table
-
-    def refresh_routing_table(self, this_node):
-        updated_routing_table = False
-        self.clear_routing_table()
-
-        for hostname, destinations in self.neighbor_routing_tables.iteritems():
-            for destination_address, cost in destinations.iteritems():
-                if self.routing_table.get(destination_address) is None \
-                            or (cost + 1) < self.routing_table[destination_address][0]:
-                    self.routing_table[destination_address] = [cost + 1, this_node.get_link(hostname)]
-                    updated_routing_table = True
-
-        return updated_routing_table
-
-    def clear_routing_table(self):
-        entries_to_remove = []
-
-        for destination_address, data in self.routing_table.iteritems():
-            link = data[1]
-            if link is not None:
-                entries_to_remove.append(destination_address)
-
-        for entry in entries_to_remove:
-            del self.routing_table[entry]
-
-        # print "Remaining routing_table items: %s" % self.routing_table
+    def upsert_neighbor_routing_table(self, hostname, neighbor_routing_table, partial=False):
+        # a partial table only has the destinations that changed; costs
+        # of INFINITY remove a destination. Returns the destinations
+        # whose cost from this neighbor changed
+        old_routing_table = self.neighbor_routing_tables.get(hostname, {})
+        if partial:
+            new_routing_table = dict(old_routing_table)
+        else:
+            new_routing_table = dict()
+        for destination_address, cost in neighbor_routing_table.iteritems():
+            if cost < INFINITY:
+                new_routing_table[destination_address] = cost
+            elif partial:
+                new_routing_table.pop(destination_address, None)
+
+        self.neighbor_routing_tables[hostname] = new_routing_table
+        if old_routing_table == new_routing_table:
+            return set()
+
+        changed = set()
+        for destination_address, cost in new_routing_table.iteritems():
+            if old_routing_table.get(destination_address) != cost:
+                changed.add(destination_address)
+        for destination_address in old_routing_table:
+            if destination_address not in new_routing_table:
+                changed.add(destination_address)
+
+        return changed
+
+    def refresh_routing_table(self, this_node, destinations=None):
+        # recompute the routes to the given destinations, or to all of
+        # them if destinations is None, from the neighbor routing tables;
+        # returns the routes that changed, format:
+        # {destination_address: link, or None if there is no route}
+        if destinations is None:
+            destinations = set(self.routing_table)
+            for neighbor_routing_table in self.neighbor_routing_tables.itervalues():
+                destinations.update(neighbor_routing_table)
+
+        changes = dict()
+        for destination_address in destinations:
+            entry = self.routing_table.get(destination_address)
+            if entry is not None and entry[1] is None:
+                # one of our own addresses
+                continue
+
+            best = None
+            if destination_address not in self.held:
+                for hostname, neighbor_routing_table in self.neighbor_routing_tables.iteritems():
+                    cost = neighbor_routing_table.get(destination_address)
+                    if cost is not None and (cost + 1) < INFINITY \
+                            and (best is None or (cost + 1) < best[0]):
+                        best = [cost + 1, this_node.get_link(hostname)]
+
+            if best is None:
+                if entry is not None:
+                    del self.routing_table[destination_address]
+                    changes[destination_address] = None
+            elif best != entry:
+                self.routing_table[destination_address] = best
+                changes[destination_address] = best[1]
+
+        return changes
 
     def remove_neighbor_routing_table(self, hostname):
-        if self.neighbor_routing_tables.get(hostname):
-            self.neighbor_routing_tables.pop(hostname)
+        # returns the destinations this neighbor had a cost for
+        neighbor_routing_table = self.neighbor_routing_tables.pop(hostname, None)
+        if not neighbor_routing_table:
+            return set()
+        return set(neighbor_routing_table)
 
 class DistanceVectorApp(object):
-    def __init__(self, node):
+    def __init__(self, node, period=30, timeout=90, triggered_delay=1,
+                 poison_reverse=True, hold_down=0, rounds=200):
         # the format used for the routing table is {address: cost}
         self.routing_table = RoutingTable()
         self.node = node
         self.source_address = None
         self.broadcast_count = 0
 
-        # format: {neighbor_hostname: last_contact_timestamp}
-        self.last_contact_list = dict()
-
-    def rebuild_forwarding_table(self):
-        self.node.clear_forwarding_table()
-        entries = self.routing_table.get_forwarding_table_entries()
-
-        for destination_address, destination_link in entries.iteritems():
-            self.node.add_forwarding_entry(destination_address,destination_link)
-
-    def check_disabled_nodes(self, hostname):
-        # print "(%s) Updating last_contact: %s" % (self.node.hostname, hostname)
-        current_time = Sim.scheduler.current_time()
-        self.last_contact_list[hostname] = current_time
-        removed_hostnames = []
-
-        # print "(%s) last_contact list: %s" % (self.node.hostname, self.last_contact_list)
-
-        for hostname, last_contacted in self.last_contact_list.iteritems():
-            if current_time - last_contacted >= 90:
-                self.routing_table.remove_neighbor_routing_table(hostname)
-                removed_hostnames.append(hostname)
-
-        for neighbor_hostname in removed_hostnames:
-            self.last_contact_list.pop(neighbor_hostname)
-            print "%s - Removing last_contact_list entry: %s" % (Sim.scheduler.current_time(), neighbor_hostname)
-
-        if len(removed_hostnames) > 0:
-            self.routing_table.refresh_routing_table(self.node)
-            return True
+        # seconds between full updates, and the number of them to send
+        self.period = period
+        self.rounds = rounds
+        # a neighbor we have not heard from for timeout seconds is
+        # considered down; format: {neighbor_hostname: timer}
+        self.timeout = timeout
+        self.neighbor_timers = dict()
+        # routes that change are sent to the neighbors in a partial
+        # update triggered_delay seconds later, so changes that happen
+        # close together go out in one message; None turns triggered
+        # updates off
+        self.triggered_delay = triggered_delay
+        self.triggered_destinations = set()
+        self.triggered_event = None
+        # advertise routes back to the neighbor they go through with a
+        # cost of INFINITY
+        self.poison_reverse = poison_reverse
+        # a destination that becomes unreachable is not routed to again
+        # for hold_down seconds, so stale routes to it still going around
+        # are not picked up; 0 turns hold-down off
+        self.hold_down = hold_down
+
+        # number of routing messages sent on links
+        self.messages = 0
+        # set once the last full update has been sent
+        self.stopped = False
+
+    def trace(self, message, *args):
+        self.node.sim.trace("DistanceVector", message, *args)
+
+    def update_forwarding_table(self, changes):
+        # apply changes from refresh_routing_table to the forwarding table,
+        # and tell the neighbors about them
+        if not changes:
+            return
+
+        lost = []
+        for destination_address, destination_link in changes.iteritems():
+            if destination_link is None:
+                self.node.delete_forwarding_entry(destination_address, None)
+                lost.append(destination_address)
+            else:
+                self.node.add_forwarding_entry(destination_address, destination_link)
+
+        if self.hold_down > 0 and lost:
+            self.routing_table.held.update(lost)
+            self.node.sim.scheduler.add(delay=self.hold_down, event=lost, handler=self.release_hold_down)
+
+        self.trigger_update(changes)
+
+    def release_hold_down(self, destinations):
+        self.routing_table.held.difference_update(destinations)
+        changes = self.routing_table.refresh_routing_table(self.node, destinations)
+        self.update_forwarding_table(changes)
+
+    # neighbors
+
+    def heard_from(self, hostname):
+        timer = self.neighbor_timers.get(hostname)
+        if timer is None:
+            scheduler = self.node.sim.scheduler
+            self.neighbor_timers[hostname] = scheduler.add_timer(delay=self.timeout, event=hostname, handler=self.neighbor_timed_out)
+        else:
+            self.node.sim.scheduler.reset_timer(timer)
 
-        return False
+    def neighbor_timed_out(self, hostname):
+        self.trace("%s removing neighbor %s", self.node.hostname, hostname)
+        del self.neighbor_timers[hostname]
+        changed = self.routing_table.remove_neighbor_routing_table(hostname)
+        changes = self.routing_table.refresh_routing_table(self.node, changed)
+        self.update_forwarding_table(changes)
 
     def receive_packet(self,received_packet):
         # print Sim.scheduler.current_time(), self.node.hostname, received_packet.ident, received_packet.body
+        if self.stopped:
+            return
         hostname = received_packet.body['hostname']
         neighbor_routing_table = received_packet.body['routing_table']
-        node_status_updated = self.check_disabled_nodes(hostname)
+        partial = received_packet.body['partial']
+        self.heard_from(hostname)
 
         self.source_address, updated_self_link = self.routing_table.check_link_to_self(self.node, hostname)
-        self.routing_table.upsert_neighbor_routing_table(hostname, neighbor_routing_table)
-        updated_routing_table = self.routing_table.refresh_routing_table(self.node)
-
-        if updated_routing_table or updated_self_link or node_status_updated:
+        if updated_self_link:
+            self.trigger_update([self.source_address])
+        # only the destinations this neighbor now advertises a different
+        # cost for need their routes recomputed
+        changed = self.routing_table.upsert_neighbor_routing_table(hostname, neighbor_routing_table, partial)
+        changes = self.routing_table.refresh_routing_table(self.node, changed)
+
+        if changes:
             # print ("%d, %s, Updated Routing Table Values:\n" + str(self.routing_table.get_routing_table())) % (Sim.scheduler.current_time(), self.node.hostname)
             # print "%s neighbor routing tables: %s" % (self.node.hostname, self.routing_table.neighbor_routing_tables)
-            self.rebuild_forwarding_table()
+            self.update_forwarding_table(changes)
+
+    # sending routing tables
+
+    def send_routing_table(self, destinations=None):
+        # send the routes to each neighbor on its own link, so that split
+        # horizon can leave out what that neighbor told us
+        partial = destinations is not None
+        scheduler = self.node.sim.scheduler
+        routing_table = None
+        for link in self.node.links:
+            if routing_table is None or self.poison_reverse:
+                routing_table = self.routing_table.get_routing_table(link if self.poison_reverse else None, destinations)
+
+            data_dictionary = dict()
+            data_dictionary['hostname'] = self.node.hostname
+            data_dictionary['routing_table'] = routing_table
+            data_dictionary['partial'] = partial
+
+            routing_table_packet = packet.Packet(destination_address=0, ident=0, ttl=1, protocol='dvrouting', body=data_dictionary)
+            scheduler.add(delay=0, event=routing_table_packet, handler=link.send_packet)
+            self.messages += 1
+
+    def trigger_update(self, changes):
+        if self.triggered_delay is None or self.stopped:
+            return
+        self.triggered_destinations.update(changes)
+        if self.triggered_event is None:
+            scheduler = self.node.sim.scheduler
+            self.triggered_event = scheduler.add(delay=self.triggered_delay, event=None, handler=self.send_triggered_update)
+
+    def send_triggered_update(self, event):
+        self.triggered_event = None
+        destinations = self.triggered_destinations
+        self.triggered_destinations = set()
+        self.send_routing_table(destinations)
 
     def broadcast_routing_table(self, event):
-        routing_table = self.routing_table.get_routing_table()
-        hostname = self.node.hostname
-
-        data_dictionary = dict()
-        data_dictionary['hostname'] = hostname
-        data_dictionary['routing_table'] = routing_table
-
-        routing_table_packet = packet.Packet(destination_address=0, ident=0, ttl=1, protocol='dvrouting', body=data_dictionary)
-        Sim.scheduler.add(delay=0, event=routing_table_packet, handler=self.node.send_packet)
-
-        if self.broadcast_count < 200:
-            if self.broadcast_count == 75 and self.node.hostname == 'n1':
-                Sim.scheduler.add(delay=0, event=None, handler=n1.get_link('n4').down)
-                Sim.scheduler.add(delay=0, event=None, handler=n4.get_link('n1').down)
-                print "%s - ----> DISABLED LINKS <----" % Sim.scheduler.current_time()
-            elif self.broadcast_count == 150 and self.node.hostname == 'n1':
-                Sim.scheduler.add(delay=0, event=None, handler=n1.get_link('n4').up)
-                Sim.scheduler.add(delay=0, event=None, handler=n4.get_link('n1').up)
-                print "%s - ----> ENABLED LINKS <----" % Sim.scheduler.current_time()
-
-            Sim.scheduler.add(delay=30, event="", handler=self.broadcast_routing_table)
+        scheduler = self.node.sim.scheduler
+        # a full update covers any pending triggered update
+        if self.triggered_event is not None:
+            scheduler.cancel(self.triggered_event)
+            self.triggered_event = None
+        self.triggered_destinations.clear()
+        self.send_routing_table()
+
+        if self.broadcast_count < self.rounds:
+            scheduler.add_timer(delay=self.period, event="", handler=self.broadcast_routing_table)
             self.broadcast_count += 1
         else:
-            # print
-            print "(%s) --------> ENDING <--------" % Sim.scheduler.current_time()
+            self.trace("%s --------> ENDING <--------", self.node.hostname)
+            self.stop()
+
+    def stop(self):
+        # stop routing, so the simulation can end
+        self.stopped = True
+        if self.triggered_event is not None:
+            self.node.sim.scheduler.cancel(self.triggered_event)
+            self.triggered_event = None
+        for timer in self.neighbor_timers.itervalues():
+            self.node.sim.scheduler.cancel_timer(timer)
+        self.neighbor_timers.clear()
 
 class NodePrinter(object):
     def __init__(self, node):
         self.node = node
 
     def receive_packet(self, packet):
-        print "%s - (%s) Packet ARRIVED - Data: %s; Source_Address: %s; Destination_Address: %s" % (Sim.scheduler.current_time(), self.node.hostname, packet.body, packet.source_address, packet.destination_address)
+        print "%s - (%s) Packet ARRIVED - Data: %s; Source_Address: %s; Destination_Address: %s" % (self.node.sim.scheduler.current_time(), self.node.hostname, printable_body(packet), packet.source_address, packet.destination_address)
 
 if __name__ == '__main__':
     # parameters
     Sim.scheduler.reset()
     Sim.set_debug(True)
+    Sim.set_debug('DistanceVector')
 
     # setup network
     net = Network('../networks/fifteen-nodes.txt')
@@ -227,6 +366,11 @@ if __name__ == '__main__':
     d15 = DistanceVectorApp(n15)
     n15.add_protocol(protocol="dvrouting", handler=d15)
 
+    # print every forwarded packet
+    observer = PrintObserver()
+    for n in net.nodes.values():
+        n.set_observer(observer)
+
     p1 = NodePrinter(n1)
     n1.add_protocol(protocol="printer", handler=p1)
     p2 = NodePrinter(n2)
@@ -258,6 +402,20 @@ if __name__ == '__main__':
     p15 = NodePrinter(n15)
     n15.add_protocol(protocol="printer", handler=p15)
 
+    # take the link between n1 and n4 down, and later bring it back up
+    def disable_links(event):
+        n1.get_link('n4').down(event)
+        n4.get_link('n1').down(event)
+        print "%s - ----> DISABLED LINKS <----" % Sim.scheduler.current_time()
+
+    def enable_links(event):
+        n1.get_link('n4').up(event)
+        n4.get_link('n1').up(event)
+        print "%s - ----> ENABLED LINKS <----" % Sim.scheduler.current_time()
+
+    Sim.scheduler.add(delay=2250, event=None, handler=disable_links)
+    Sim.scheduler.add(delay=4500, event=None, handler=enable_links)
+
     d1.broadcast_routing_table("")
     d2.broadcast_routing_table("")
     d3.broadcast_routing_table("")
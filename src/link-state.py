@@ -0,0 +1,401 @@
+import sys
+sys.path.append('..')
+
+from src.sim import Sim
+from src import packet
+from src.observer import PrintObserver,printable_body
+
+from networks.network import Network
+
+import collections
+import heapq
+
+class LinkStateDatabase(object):
+    def __init__(self, root):
+        # hostname of the node computing the routes
+        self.root = root
+
+        # format: {hostname: lsa}, where an lsa is a dictionary with the
+        # hostname, sequence, neighbors ({neighbor_hostname: cost}) and
+        # addresses of the node that originated it
+        self.lsas = dict()
+
+        # shortest path tree, format: {hostname: distance},
+        # {hostname: parent_hostname} and {hostname: set(child_hostnames)}
+        self.distance = {root: 0}
+        self.parent = {root: None}
+        self.children = collections.defaultdict(set)
+
+        # format: {hostname: first_hop_neighbor_hostname}
+        self.first = dict()
+
+    def cost(self, start, end):
+        # cost of the link from start to end; a link is only used when
+        # both ends list each other as neighbors
+        start_lsa = self.lsas.get(start)
+        end_lsa = self.lsas.get(end)
+        if start_lsa is None or end_lsa is None or start not in end_lsa['neighbors']:
+            return None
+        return start_lsa['neighbors'].get(end)
+
+    def install(self, lsa):
+        # returns None if the lsa is not newer than the one we have,
+        # otherwise the links whose cost changed, as a list of
+        # (start, end, old_cost, new_cost), with None for no link
+        hostname = lsa['hostname']
+        old_lsa = self.lsas.get(hostname)
+        if old_lsa is not None and old_lsa['sequence'] >= lsa['sequence']:
+            return None
+
+        neighbors = set(lsa['neighbors'])
+        if old_lsa is not None:
+            neighbors.update(old_lsa['neighbors'])
+        links = []
+        for neighbor in neighbors:
+            links.append((hostname, neighbor))
+            links.append((neighbor, hostname))
+
+        old_costs = [self.cost(start, end) for start, end in links]
+        self.lsas[hostname] = lsa
+        changed = []
+        for (start, end), old_cost in zip(links, old_costs):
+            new_cost = self.cost(start, end)
+            if new_cost != old_cost:
+                changed.append((start, end, old_cost, new_cost))
+
+        return changed
+
+    # shortest paths
+
+    def spf(self):
+        # compute the shortest path tree from scratch with Dijkstra's
+        # algorithm; returns the hostnames whose first hop changed
+        self.distance = {self.root: 0}
+        self.parent = {self.root: None}
+        self.children = collections.defaultdict(set)
+        old_first = self.first
+        self.first = dict()
+
+        done = set()
+        heap = [(0, self.root)]
+        while heap:
+            distance, hostname = heapq.heappop(heap)
+            if hostname in done:
+                continue
+            done.add(hostname)
+            parent = self.parent[hostname]
+            if parent is not None:
+                if parent == self.root:
+                    self.first[hostname] = hostname
+                else:
+                    self.first[hostname] = self.first[parent]
+            self.relax(hostname, distance, heap, done)
+
+        changed = set()
+        for hostname in set(old_first) | set(self.first):
+            if old_first.get(hostname) != self.first.get(hostname):
+                changed.add(hostname)
+        return changed
+
+    def relax(self, hostname, distance, heap, done=()):
+        lsa = self.lsas.get(hostname)
+        if lsa is None:
+            return
+        for neighbor, cost in lsa['neighbors'].iteritems():
+            if neighbor in done or self.cost(hostname, neighbor) is None:
+                continue
+            if neighbor not in self.distance or distance + cost < self.distance[neighbor]:
+                self.distance[neighbor] = distance + cost
+                self.set_parent(neighbor, hostname)
+                heapq.heappush(heap, (distance + cost, neighbor))
+
+    def set_parent(self, hostname, parent):
+        old_parent = self.parent.get(hostname)
+        if old_parent is not None:
+            self.children[old_parent].discard(hostname)
+        self.parent[hostname] = parent
+        if parent is not None:
+            self.children[parent].add(hostname)
+
+    def update_link(self, start, end, old_cost, new_cost):
+        # incremental SPF: update the shortest path tree after the cost
+        # of one link changed, touching only the nodes whose path
+        # changes; returns the hostnames whose first hop changed
+        if start not in self.distance:
+            return set()
+
+        heap = []
+        if new_cost is not None and (old_cost is None or new_cost < old_cost):
+            # a cheaper link can only shorten paths through it
+            distance = self.distance[start] + new_cost
+            if end in self.distance and distance >= self.distance[end]:
+                return set()
+            self.distance[end] = distance
+            self.set_parent(end, start)
+            heap.append((distance, end))
+            affected = set()
+        else:
+            # a dearer or missing link only matters to the subtree below
+            # it, whose paths are found again from the rest of the tree
+            if self.parent.get(end) != start:
+                return set()
+            affected = self.subtree(end)
+            for hostname in affected:
+                del self.distance[hostname]
+                self.children[self.parent.pop(hostname)].discard(hostname)
+            for hostname in affected:
+                best = None
+                for neighbor in self.lsas[hostname]['neighbors']:
+                    cost = self.cost(neighbor, hostname)
+                    if cost is None or neighbor not in self.distance:
+                        continue
+                    if best is None or self.distance[neighbor] + cost < best[0]:
+                        best = (self.distance[neighbor] + cost, neighbor)
+                if best is not None:
+                    self.distance[hostname] = best[0]
+                    self.set_parent(hostname, best[1])
+                    heapq.heappush(heap, (best[0], hostname))
+
+        while heap:
+            distance, hostname = heapq.heappop(heap)
+            if distance > self.distance[hostname]:
+                continue
+            affected.add(hostname)
+            self.relax(hostname, distance, heap)
+
+        return self.update_first(affected)
+
+    def subtree(self, hostname):
+        nodes = set([hostname])
+        stack = [hostname]
+        while stack:
+            for child in self.children.get(stack.pop(), ()):
+                nodes.add(child)
+                stack.append(child)
+        return nodes
+
+    def update_first(self, affected):
+        # recompute the first hop of the affected nodes and of everything
+        # below them in the tree; returns the hostnames whose first hop
+        # changed
+        changed = set()
+        reachable = []
+        for hostname in affected:
+            if hostname in self.distance:
+                reachable.append((self.distance[hostname], hostname))
+            elif hostname in self.first:
+                del self.first[hostname]
+                changed.add(hostname)
+
+        # parents have smaller distances, so they are done first
+        for distance, hostname in sorted(reachable):
+            stack = [hostname]
+            while stack:
+                current = stack.pop()
+                parent = self.parent[current]
+                if parent == self.root:
+                    first = current
+                else:
+                    first = self.first[parent]
+                if self.first.get(current) != first:
+                    self.first[current] = first
+                    changed.add(current)
+                    stack.extend(self.children.get(current, ()))
+
+        return changed
+
+class LinkStateApp(object):
+    def __init__(self, node, hello_interval=10, dead_interval=40,
+                 refresh_interval=1800, incremental=True):
+        self.node = node
+        self.database = LinkStateDatabase(node.hostname)
+        self.sequence = 0
+
+        # hellos are sent every hello_interval seconds, and a neighbor
+        # we have not heard from for dead_interval seconds is considered
+        # down; format: {neighbor_hostname: timer}
+        self.hello_interval = hello_interval
+        self.dead_interval = dead_interval
+        self.neighbor_timers = dict()
+        # our lsa is flooded again every refresh_interval seconds
+        self.refresh_interval = refresh_interval
+        # recompute only the part of the shortest path tree a changed
+        # link affects, instead of all of it
+        self.incremental = incremental
+
+        # format: {hostname: addresses} for the forwarding entries added
+        self.installed = dict()
+
+        # number of routing messages sent on links
+        self.messages = 0
+
+    def trace(self, message, *args):
+        self.node.sim.trace("LinkState", message, *args)
+
+    def start(self):
+        self.send_hello("")
+        self.refresh("")
+
+    # neighbors
+
+    def send_hello(self, event):
+        data_dictionary = dict()
+        data_dictionary['type'] = 'hello'
+        data_dictionary['hostname'] = self.node.hostname
+
+        hello_packet = packet.Packet(destination_address=0, ident=0, ttl=1, protocol='lsrouting', body=data_dictionary)
+        scheduler = self.node.sim.scheduler
+        scheduler.add(delay=0, event=hello_packet, handler=self.node.forward_broadcast_packet)
+        self.messages += len(self.node.links)
+        scheduler.add_timer(delay=self.hello_interval, event="", handler=self.send_hello)
+
+    def heard_from(self, hostname):
+        scheduler = self.node.sim.scheduler
+        timer = self.neighbor_timers.get(hostname)
+        if timer is not None:
+            scheduler.reset_timer(timer)
+            return
+
+        self.trace("%s adding neighbor %s", self.node.hostname, hostname)
+        self.neighbor_timers[hostname] = scheduler.add_timer(delay=self.dead_interval, event=hostname, handler=self.neighbor_timed_out)
+        # bring the new neighbor up to date
+        neighbor_link = self.node.get_link(hostname)
+        for lsa in self.database.lsas.values():
+            scheduler.add(delay=0, event=self.lsa_packet(lsa), handler=neighbor_link.send_packet)
+            self.messages += 1
+        self.originate()
+
+    def neighbor_timed_out(self, hostname):
+        self.trace("%s removing neighbor %s", self.node.hostname, hostname)
+        del self.neighbor_timers[hostname]
+        self.originate()
+
+    # link state advertisements
+
+    def lsa_packet(self, lsa):
+        data_dictionary = dict()
+        data_dictionary['type'] = 'lsa'
+        data_dictionary['lsa'] = lsa
+        return packet.Packet(destination_address=0, ident=0, ttl=1, protocol='lsrouting', body=data_dictionary)
+
+    def refresh(self, event):
+        self.originate()
+        scheduler = self.node.sim.scheduler
+        scheduler.add(delay=self.refresh_interval, event="", handler=self.refresh)
+
+    def originate(self):
+        # flood a new lsa with our current neighbors
+        self.sequence += 1
+        lsa = dict()
+        lsa['hostname'] = self.node.hostname
+        lsa['sequence'] = self.sequence
+        lsa['neighbors'] = dict((hostname, 1) for hostname in self.neighbor_timers)
+        lsa['addresses'] = [l.address for l in self.node.links]
+        self.receive_lsa(lsa)
+
+    def receive_lsa(self, lsa):
+        changed_links = self.database.install(lsa)
+        if changed_links is None:
+            # we have already seen this one
+            return
+
+        # flood it on to the neighbors
+        scheduler = self.node.sim.scheduler
+        scheduler.add(delay=0, event=self.lsa_packet(lsa), handler=self.node.forward_broadcast_packet)
+        self.messages += len(self.node.links)
+
+        if self.incremental:
+            changed = set()
+            for start, end, old_cost, new_cost in changed_links:
+                changed.update(self.database.update_link(start, end, old_cost, new_cost))
+        elif changed_links:
+            changed = self.database.spf()
+        else:
+            changed = set()
+
+        hostname = lsa['hostname']
+        if self.installed.get(hostname, lsa['addresses']) != lsa['addresses']:
+            changed.add(hostname)
+        self.update_forwarding_table(changed)
+
+    def update_forwarding_table(self, changed):
+        for hostname in changed:
+            for address in self.installed.pop(hostname, ()):
+                self.node.delete_forwarding_entry(address, None)
+            first = self.database.first.get(hostname)
+            if first is None:
+                continue
+            destination_link = self.node.get_link(first)
+            addresses = self.database.lsas[hostname]['addresses']
+            for address in addresses:
+                self.node.add_forwarding_entry(address, destination_link)
+            self.installed[hostname] = addresses
+
+    def receive_packet(self, received_packet):
+        body = received_packet.body
+        if body['type'] == 'hello':
+            self.heard_from(body['hostname'])
+        elif body['type'] == 'lsa':
+            self.receive_lsa(body['lsa'])
+
+class NodePrinter(object):
+    def __init__(self, node):
+        self.node = node
+
+    def receive_packet(self, packet):
+        print "%s - (%s) Packet ARRIVED - Data: %s; Source_Address: %s; Destination_Address: %s" % (self.node.sim.scheduler.current_time(), self.node.hostname, printable_body(packet), packet.source_address, packet.destination_address)
+
+if __name__ == '__main__':
+    # parameters
+    Sim.scheduler.reset()
+    Sim.set_debug('LinkState')
+
+    # setup network
+    net = Network('../networks/fifteen-nodes.txt')
+
+    # print every forwarded packet
+    observer = PrintObserver()
+
+    # setup link state routing and a printer on every node
+    apps = []
+    for hostname in sorted(net.nodes.keys()):
+        n = net.nodes[hostname]
+        app = LinkStateApp(n)
+        n.add_protocol(protocol="lsrouting", handler=app)
+        n.add_protocol(protocol="printer", handler=NodePrinter(n))
+        n.set_observer(observer)
+        apps.append(app)
+
+    n1 = net.get_node('n1')
+    n4 = net.get_node('n4')
+    n10 = net.get_node('n10')
+    n11 = net.get_node('n11')
+
+    # take the link between n1 and n4 down, and later bring it back up
+    def disable_links(event):
+        n1.get_link('n4').down(event)
+        n4.get_link('n1').down(event)
+        print "%s - ----> DISABLED LINKS <----" % Sim.scheduler.current_time()
+
+    def enable_links(event):
+        n1.get_link('n4').up(event)
+        n4.get_link('n1').up(event)
+        print "%s - ----> ENABLED LINKS <----" % Sim.scheduler.current_time()
+
+    Sim.scheduler.add(delay=2250, event=None, handler=disable_links)
+    Sim.scheduler.add(delay=4500, event=None, handler=enable_links)
+
+    for app in apps:
+        app.start()
+
+    p = packet.Packet(protocol="printer", source_address=n11.get_address('n4'), destination_address=n10.get_address('n1'), body="Hello world!")
+    Sim.scheduler.add(delay=900,event=p, handler=n11.send_packet)
+
+    Sim.scheduler.add(delay=2800, event=p, handler=n11.send_packet)
+
+    Sim.scheduler.add(delay=5500, event=p, handler=n11.send_packet)
+
+    Sim.scheduler.add(delay=6000, event=None, handler=lambda event: Sim.scheduler.stop())
+
+    # run the simulation
+    Sim.scheduler.run()
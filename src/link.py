@@ -1,63 +1,149 @@
 from sim import Sim
-
-import random
+from discipline import DropTail
+import tracefile
 
 class Link(object):
     def __init__(self,address=0,startpoint=None,endpoint=None,queue_size=None,
-                 bandwidth=1000000.0,propagation=0.001,loss=0):
+                 bandwidth=1000000.0,propagation=0.001,loss=0,sim=Sim,
+                 queue_bytes=None):
+        self.sim = sim
         self.running = True
         self.address = address
         self.startpoint = startpoint
         self.endpoint = endpoint
+        # capacity of the queue in packets and in bytes; None means
+        # unlimited
         self.queue_size = queue_size
+        self.queue_bytes = queue_bytes
         self.bandwidth = bandwidth
         self.propagation = propagation
         self.loss = loss
-        self.busy = False
-        self.queue = []
+        # time when the current transmission ends
+        self.free = 0
+        # true if an event is scheduled to send the next queued packet
+        self.pending = False
+        # queue discipline, see discipline.py
+        self.queue = None
+        self.set_discipline(DropTail())
+        # packets accepted by the link, dropped due to a full queue or by
+        # the queue discipline, and dropped due to random loss
+        self.enqueued = 0
+        self.dropped = 0
+        self.lost = 0
+        # largest number of packets and bytes that have been queued
+        self.max_depth = 0
+        self.max_bytes = 0
+
+    def trace(self,message,*args):
+        self.sim.trace("Link",message,*args)
 
-    def trace(self,message):
-        Sim.trace("Link",message)
+    def set_discipline(self,discipline):
+        ''' Use a new queue discipline. Any packets in the old queue are
+            moved to the new one.'''
+        discipline.attach(self)
+        if self.queue is not None:
+            now = self.sim.scheduler.current_time()
+            packet = self.queue.dequeue(now)
+            while packet is not None:
+                discipline.enqueue(packet,now)
+                packet = self.queue.dequeue(now)
+        self.queue = discipline
 
     ## Handling packets ##
 
     def send_packet(self,packet):
         # check if link is running
         if not self.running:
+            packet.release()
             return
         # drop packet due to queue overflow
-        if self.queue_size and len(self.queue) == self.queue_size:
-            self.trace("%d dropped packet due to queue overflow" % (self.address))
+        if self.full(packet):
+            self.drop(packet,"queue overflow")
             return
         # drop packet due to random loss
-        if self.loss > 0 and random.random() < self.loss:
-            self.trace("%d dropped packet due to random loss" % (self.address))
+        if self.loss > 0 and self.sim.random.random() < self.loss:
+            self.lost += 1
+            self.trace("%d dropped packet due to random loss",self.address)
+            self.record(tracefile.DROP,packet)
+            packet.release()
             return
-        packet.enter_queue = Sim.scheduler.current_time()
-        if len(self.queue) == 0 and not self.busy:
+        now = self.sim.scheduler.current_time()
+        packet.enter_queue = now
+        if not self.queue and now >= self.free:
             # packet can be sent immediately
-            self.busy = True
+            self.accept(packet)
             self.transmit(packet)
-        else:
-            # add packet to queue
-            self.queue.append(packet)
-        
+            return
+        # add packet to queue
+        if not self.queue.enqueue(packet,now):
+            self.drop(packet,"queue discipline")
+            return
+        self.accept(packet)
+        if not self.pending:
+            # send it when the current transmission ends
+            self.pending = True
+            self.sim.scheduler.add(delay=self.free - now,event='finish',handler=self.next)
+        if len(self.queue) > self.max_depth:
+            self.max_depth = len(self.queue)
+        if self.queue.bytes > self.max_bytes:
+            self.max_bytes = self.queue.bytes
+
+    def accept(self,packet):
+        self.enqueued += 1
+        if self.sim.tracer:
+            self.record(tracefile.ENQUEUE,packet)
+
+    def drop(self,packet,reason):
+        ''' Drop a packet from the queue. '''
+        self.dropped += 1
+        self.trace("%d dropped packet due to %s",self.address,reason)
+        self.record(tracefile.DROP,packet)
+        packet.release()
+
+    def full(self,packet):
+        ''' Return true if there is no room in the queue for this packet. '''
+        if self.queue_size and len(self.queue) >= self.queue_size:
+            return True
+        if self.queue_bytes and self.queue.bytes + packet.length > self.queue_bytes:
+            return True
+        return False
+
+    @property
+    def busy(self):
+        ''' True while a packet is being transmitted. '''
+        return self.sim.scheduler.current_time() < self.free
+
     def transmit(self,packet):
-        packet.queueing_delay += Sim.scheduler.current_time() - packet.enter_queue
+        now = self.sim.scheduler.current_time()
+        packet.queueing_delay += now - packet.enter_queue
         delay = (8.0*packet.length)/self.bandwidth
+        self.free = now + delay
         packet.transmission_delay += delay
         packet.propagation_delay += self.propagation
+        if self.sim.tracer:
+            self.record(tracefile.TRANSMIT,packet)
         # schedule packet arrival at end of link
-        Sim.scheduler.add(delay=delay+self.propagation,event=packet,handler=self.endpoint.receive_packet)
-        # schedule next transmission
-        Sim.scheduler.add(delay=delay,event='finish',handler=self.next)
+        self.sim.scheduler.add(delay=delay+self.propagation,event=packet,handler=self.endpoint.receive_packet)
 
     def next(self,event):
-        if len(self.queue) > 0:
-            packet = self.queue.pop(0)
+        ''' Send the next queued packet. This is only scheduled when a
+            packet is waiting, so an idle link needs one event per
+            packet instead of two.'''
+        self.pending = False
+        packet = None
+        if self.queue:
+            packet = self.queue.dequeue(self.sim.scheduler.current_time())
+        if packet is not None:
             self.transmit(packet)
-        else:
-            self.busy = False
+        if self.queue:
+            self.pending = True
+            self.sim.scheduler.add(delay=self.free - self.sim.scheduler.current_time(),event='finish',handler=self.next)
+
+    def record(self,kind,packet):
+        ''' Record a packet event with the simulation's tracer. '''
+        if self.sim.tracer:
+            self.sim.tracer.record(self.sim.scheduler.current_time(),kind,
+                                   self.startpoint,self,packet)
 
     def down(self,event):
         self.running = False
@@ -1,38 +1,51 @@
 from sim import Sim
-
-import copy
+import tracefile
 
 class Node(object):
-    def __init__(self,hostname):
+    def __init__(self,hostname,sim=Sim):
+        self.sim = sim
         self.hostname = hostname
         self.links = []
+        # indexes of the links by their address and by the hostname of
+        # the neighbor at the other end; where two links share a key, the
+        # first one added is used
+        self.addresses = {}
+        self.neighbors = {}
         self.protocols = {}
         self.forwarding_table = {}
+        # observer called for every forwarded unicast packet, see
+        # observer.py
+        self.observer = None
 
-    def trace(self,message):
-        Sim.trace("Node",message)
+    def trace(self,message,*args):
+        self.sim.trace("Node",message,*args)
 
     ## Links ## 
 
     def add_link(self,link):
         self.links.append(link)
+        self.addresses.setdefault(link.address,link)
+        self.neighbors.setdefault(link.endpoint.hostname,link)
 
     def delete_link(self,link):
         if link not in self.links:
             return
         self.links.remove(link)
+        # rebuild the indexes in case another link shares a key
+        self.addresses.clear()
+        self.neighbors.clear()
+        for link in self.links:
+            self.addresses.setdefault(link.address,link)
+            self.neighbors.setdefault(link.endpoint.hostname,link)
 
     def get_link(self,name):
-        for link in self.links:
-            if link.endpoint.hostname == name:
-                return link
-        return None
+        return self.neighbors.get(name)
 
     def get_address(self,name):
-        for link in self.links:
-            if link.endpoint.hostname == name:
-                return link.address
-        return 0
+        link = self.neighbors.get(name)
+        if link is None:
+            return 0
+        return link.address
 
     ## Protocols ## 
 
@@ -44,6 +57,11 @@ class Node(object):
             return
         del self.protocols[protocol]
 
+    ## Observer ##
+
+    def set_observer(self,observer):
+        self.observer = observer
+
     ## Forwarding table ##
 
     def clear_forwarding_table(self):
@@ -63,28 +81,33 @@ class Node(object):
         # if this is the first time we have seen this packet, set its
         # creation timestamp
         if packet.created == None:
-            packet.created = Sim.scheduler.current_time()
+            packet.created = self.sim.scheduler.current_time()
 
         # forward the packet
         self.forward_packet(packet)
 
     def receive_packet(self,packet):
+        if self.sim.tracer:
+            self.sim.tracer.record(self.sim.scheduler.current_time(),
+                                   tracefile.ARRIVE,self,None,packet)
         # handle broadcast packets
         if packet.destination_address == 0:
-            self.trace("%s received packet" % (self.hostname))
+            if self.sim.tracing("Node"):
+                self.trace("%s received packet",self.hostname)
             self.deliver_packet(packet)
-        else:
-            # check if unicast packet is for me
-            for link in self.links:
-                if link.address == packet.destination_address:
-                    self.trace("%s received packet" % (self.hostname))
-                    self.deliver_packet(packet)
-                    return
+        elif packet.destination_address in self.addresses:
+            # unicast packet is for me
+            if self.sim.tracing("Node"):
+                self.trace("%s received packet",self.hostname)
+            self.deliver_packet(packet)
+            packet.release()
+            return
 
         # decrement the TTL and drop if it has reached the last hop
         packet.ttl = packet.ttl - 1
         if packet.ttl <= 0:
-            self.trace("%s dropping packet due to TTL expired" % (self.hostname))
+            self.trace("%s dropping packet due to TTL expired",self.hostname)
+            packet.release()
             return
 
         # forward the packet
@@ -94,6 +117,9 @@ class Node(object):
     def deliver_packet(self,packet):
         if packet.protocol not in self.protocols:
             return
+        if self.sim.tracer:
+            self.sim.tracer.record(self.sim.scheduler.current_time(),
+                                   tracefile.DELIVER,self,None,packet)
         self.protocols[packet.protocol].receive_packet(packet)
 
 
@@ -102,20 +128,25 @@ class Node(object):
             # broadcast the packet
             self.forward_broadcast_packet(packet)
         else:
+            # report the packet before forwarding it, since it may be
+            # dropped and released to its pool
+            if self.observer:
+                self.observer.forwarded(self,packet)
             # forward the packet
             self.forward_unicast_packet(packet)
-            print "%s - (%s) Packet Forwarded - Data: %s; Source_Address: %s; Destination_Address: %s" % (Sim.scheduler.current_time(), self.hostname, packet.body, packet.source_address, packet.destination_address)
 
     def forward_unicast_packet(self,packet):
         if packet.destination_address not in self.forwarding_table:
-            self.trace("%s no routing entry for %d" % (self.hostname,packet.destination_address))
+            self.trace("%s no routing entry for %d",self.hostname,packet.destination_address)
+            packet.release()
             return
         link = self.forwarding_table[packet.destination_address]
-        self.trace("%s forwarding packet to %d" % (self.hostname,packet.destination_address))
+        if self.sim.tracing("Node"):
+            self.trace("%s forwarding packet to %d",self.hostname,packet.destination_address)
         link.send_packet(packet)
 
     def forward_broadcast_packet(self,packet):
         for link in self.links:
-            self.trace("%s forwarding broadcast packet to %s" % (self.hostname,link.endpoint.hostname))
-            packet_copy = copy.deepcopy(packet)
-            link.send_packet(packet_copy)
+            if self.sim.tracing("Node"):
+                self.trace("%s forwarding broadcast packet to %s",self.hostname,link.endpoint.hostname)
+            link.send_packet(packet.copy())
@@ -0,0 +1,63 @@
+def printable_body(packet):
+    ''' Return the body of a packet in a form that prints as its data.
+        TCP segments carry a memoryview of the send buffer, which is
+        copied into a string. '''
+    if isinstance(packet.body,memoryview):
+        return packet.body.tobytes()
+    return packet.body
+
+def describe(node,packet):
+    ''' Describe a forwarded packet in one line. '''
+    return "%s - (%s) Packet Forwarded - Data: %s; Source_Address: %s; Destination_Address: %s" % (node.sim.scheduler.current_time(), node.hostname, printable_body(packet), packet.source_address, packet.destination_address)
+
+class PrintObserver(object):
+    ''' Print a line for every forwarded packet. '''
+    def forwarded(self,node,packet):
+        print describe(node,packet)
+
+class CountObserver(object):
+    ''' Count forwarded packets. The total is kept in count, and the
+        count for each node in nodes, indexed by hostname.'''
+    def __init__(self):
+        self.count = 0
+        self.nodes = {}
+
+    def forwarded(self,node,packet):
+        self.count += 1
+        self.nodes[node.hostname] = self.nodes.get(node.hostname,0) + 1
+
+class SampleObserver(object):
+    ''' Pass one in every n forwarded packets on to another observer. '''
+    def __init__(self,observer,n):
+        self.observer = observer
+        self.n = n
+        self.count = 0
+
+    def forwarded(self,node,packet):
+        self.count += 1
+        if self.count == self.n:
+            self.count = 0
+            self.observer.forwarded(node,packet)
+
+class FileObserver(object):
+    ''' Write a line for every forwarded packet to a file. Lines are
+        collected in memory and written in blocks of buffer_lines. The
+        observer must be closed when the simulation is done.'''
+    def __init__(self,filename,buffer_lines=10000):
+        self.file = open(filename,'w')
+        self.buffer_lines = buffer_lines
+        self.lines = []
+
+    def forwarded(self,node,packet):
+        self.lines.append(describe(node,packet))
+        if len(self.lines) >= self.buffer_lines:
+            self.flush()
+
+    def flush(self):
+        if self.lines:
+            self.file.write('\n'.join(self.lines) + '\n')
+            self.lines = []
+
+    def close(self):
+        self.flush()
+        self.file.close()
@@ -1,9 +1,24 @@
 from sim import Sim
 
+def slots(cls):
+    ''' Return the names of all the slots of a packet class. '''
+    if '_slots' not in cls.__dict__:
+        names = []
+        for base in reversed(cls.__mro__):
+            names.extend(base.__dict__.get('__slots__',[]))
+        cls._slots = names
+    return cls._slots
+
 class Packet(object):
+    __slots__ = ['source_address','source_port','destination_address',
+                 'destination_port','ident','ttl','protocol','body','length',
+                 'priority','created','enter_queue','queueing_delay',
+                 'transmission_delay','propagation_delay','pool']
+
     def __init__(self,source_address=1,source_port=0,
                  destination_address=1,destination_port=0,
-                 ident=0,ttl=100,protocol="None",body="",length=0):
+                 ident=0,ttl=100,protocol="None",body="",length=0,
+                 priority=0):
         # standard packet fields
         self.source_address = source_address
         self.source_port = source_port
@@ -18,9 +33,60 @@ class Packet(object):
             self.length = len(self.body)
         if self.body:
             length = len(self.body)
+        # priority for priority queueing; 0 is the highest
+        self.priority = priority
         # measurements
         self.created = None
         self.enter_queue = 0
         self.queueing_delay = 0
         self.transmission_delay = 0
         self.propagation_delay = 0
+        # pool this packet is returned to when it is released
+        self.pool = None
+
+    def copy(self):
+        ''' Return a copy of the packet that shares its body. Only the
+            header fields, such as the TTL and the delay measurements,
+            belong to the copy. The body of a packet must not be changed
+            once the packet has been sent, since every copy sees it.'''
+        packet = self.__class__.__new__(self.__class__)
+        for name in slots(self.__class__):
+            setattr(packet,name,getattr(self,name))
+        packet.pool = None
+        return packet
+
+    def release(self):
+        ''' Return the packet to its pool, if it came from one. This is
+            called once a packet has been handled at its destination or
+            dropped. '''
+        if self.pool is not None:
+            self.pool.release(self)
+
+class PacketPool(object):
+    ''' A free list of packets of one class, so that protocols that send
+        many short-lived packets, such as TCP ACKs, can reuse them
+        instead of allocating new ones. A packet taken from the pool goes
+        back to it when it is delivered or dropped, so the handler that
+        receives it must not keep a reference to the packet after it
+        returns; keeping the body is fine. At most size free packets are
+        kept.'''
+    def __init__(self,cls=Packet,size=10000):
+        self.cls = cls
+        self.size = size
+        self.free = []
+
+    def get(self,**fields):
+        ''' Return a packet initialized with the given fields. '''
+        if self.free:
+            packet = self.free.pop()
+            packet.__init__(**fields)
+        else:
+            packet = self.cls(**fields)
+        packet.pool = self
+        return packet
+
+    def release(self,packet):
+        packet.pool = None
+        packet.body = None
+        if len(self.free) < self.size:
+            self.free.append(packet)
@@ -1,15 +1,89 @@
-import sched
+import collections
+import heapq
 import itertools
 
+# number of slots per timer wheel level is 2**BITS
+BITS = 8
+SLOTS = 1 << BITS
+MASK = SLOTS - 1
+LEVELS = 4
+
+class Timer(object):
+    ''' A timer created with Scheduler.add_timer. While the timer is
+        waiting in the wheel, slot is the set holding it and level is
+        the wheel level of that set. Once it is due, entry is its event
+        in the heap.'''
+    __slots__ = ['time','delay','count','handler','event','slot','level',
+                 'entry']
+
+    def __init__(self,delay,event,handler):
+        self.time = 0
+        self.delay = delay
+        self.count = 0
+        self.handler = handler
+        self.event = event
+        self.slot = None
+        self.level = 0
+        self.entry = None
+
 class Scheduler(object):
-    def __init__(self):
-        self.current = 0
-        self.count = itertools.count()
-        self.scheduler = sched.scheduler(self.current_time,self.advance_time)
+    ''' Discrete event scheduler. Events are kept in a binary heap
+        ordered by time and then by insertion order, so events scheduled
+        for the same time run in the order they were added. Each queue
+        entry is a list of [time, count, handler, event].
+
+        Events added with no delay go into a FIFO queue instead of the
+        heap, and run before any heap entry that would come after them,
+        so handing off work for the current time costs no heap push or
+        pop and events still run in the same order.
+
+        Timers that are frequently reset or cancelled before they expire
+        can be added with add_timer. When timer_wheel is true, these are
+        kept in a hierarchical timing wheel with slots tick seconds wide,
+        and are only moved into the heap when the clock reaches their
+        slot. Resetting or cancelling a timer in the wheel is O(1) and
+        does not touch the heap.'''
+    def __init__(self,timer_wheel=True,tick=0.001):
+        self.timer_wheel = timer_wheel
+        self.tick = tick
+        self.reset()
 
     def reset(self):
         self.current = 0
-    
+        self.count = itertools.count()
+        self.queue = []
+        # entries for the current time, in the order they were added
+        self.immediate = collections.deque()
+        # number of cancelled entries that are still queued
+        self.cancelled = 0
+        # timer wheel, one list of slots per level
+        self.wheel = [[set() for i in range(SLOTS)] for level in range(LEVELS)]
+        # number of timers at each level of the wheel
+        self.counts = [0] * LEVELS
+        # total number of timers in the wheel
+        self.timers = 0
+        # all timers in slots before this tick have been moved to the heap
+        self.wheel_tick = 0
+
+    def stop(self):
+        ''' Stop the simulation: all events and timers are removed, so
+            run returns once the current handler is done. The clock
+            keeps its time. '''
+        for level in self.wheel:
+            for slot in level:
+                for timer in slot:
+                    timer.slot = None
+                slot.clear()
+        self.counts = [0] * LEVELS
+        self.timers = 0
+        for entry in self.queue:
+            entry[2] = None
+        for entry in self.immediate:
+            entry[2] = None
+        del self.queue[:]
+        self.immediate.clear()
+        self.cancelled = 0
+
     def current_time(self):
         return self.current
 
@@ -17,10 +91,194 @@ class Scheduler(object):
         self.current += units
 
     def add(self,delay,event,handler):
-        return self.scheduler.enter(delay,next(self.count),handler,[event])
+        entry = [self.current + delay,next(self.count),handler,event]
+        if delay == 0:
+            self.immediate.append(entry)
+        else:
+            heapq.heappush(self.queue,entry)
+        return entry
+
+    def cancel(self,entry):
+        ''' Cancel an event. The entry is marked as cancelled and left
+            in the heap, where it is skipped when it reaches the top. This
+            makes cancelling O(1). When cancelled entries make up most of
+            the heap, it is rebuilt without them. Cancelling an event that
+            has already run or been cancelled does nothing.'''
+        if entry[2] is None:
+            return
+        entry[2] = None
+        entry[3] = None
+        self.cancelled += 1
+        if self.cancelled > 64 and 2*self.cancelled > len(self.queue) + len(self.immediate):
+            self.compact()
+
+    def compact(self):
+        ''' Remove all cancelled entries from the queues. '''
+        self.queue[:] = [entry for entry in self.queue if entry[2] is not None]
+        heapq.heapify(self.queue)
+        entries = [entry for entry in self.immediate if entry[2] is not None]
+        self.immediate.clear()
+        self.immediate.extend(entries)
+        self.cancelled = 0
+
+    ## Timers ##
+
+    def add_timer(self,delay,event,handler):
+        ''' Add a timer that calls handler with event after delay
+            seconds. Returns a Timer that can be given to reset_timer or
+            cancel_timer.'''
+        timer = Timer(delay,event,handler)
+        self.arm(timer,self.current + delay)
+        return timer
+
+    def reset_timer(self,timer,delay=None):
+        ''' Restart a timer so that it expires delay seconds from now. If
+            delay is None, the timer's original delay is used. A timer
+            that has already fired or was cancelled is armed again.'''
+        if delay is not None:
+            timer.delay = delay
+        self.disarm(timer)
+        self.arm(timer,self.current + timer.delay)
+
+    def cancel_timer(self,timer):
+        ''' Cancel a timer. '''
+        self.disarm(timer)
+
+    def arm(self,timer,time):
+        timer.time = time
+        timer.count = next(self.count)
+        if self.timer_wheel:
+            self.place(timer)
+        else:
+            self.push(timer)
+
+    def place(self,timer):
+        ''' Put a timer into the wheel slot for its expiration time. '''
+        tick = int(timer.time / self.tick)
+        delta = tick - self.wheel_tick
+        if delta < 0:
+            # the slot for this tick has already been emptied
+            self.push(timer)
+            return
+        level = 0
+        while delta >= SLOTS:
+            delta >>= BITS
+            level += 1
+        if level == LEVELS:
+            # too far in the future for the wheel
+            self.push(timer)
+            return
+        timer.slot = self.wheel[level][(tick >> (BITS*level)) & MASK]
+        timer.slot.add(timer)
+        timer.level = level
+        self.counts[level] += 1
+        self.timers += 1
+
+    def disarm(self,timer):
+        if timer.slot is not None:
+            timer.slot.remove(timer)
+            timer.slot = None
+            self.counts[timer.level] -= 1
+            self.timers -= 1
+        if timer.entry is not None:
+            self.cancel(timer.entry)
+            timer.entry = None
+
+    def push(self,timer):
+        ''' Put a timer into the heap. '''
+        timer.entry = [timer.time,timer.count,timer.handler,timer.event]
+        heapq.heappush(self.queue,timer.entry)
+
+    def cascade(self,tick):
+        ''' Move timers down from the higher levels of the wheel whose
+            slots start at this tick. '''
+        levels = []
+        level = 1
+        while level < LEVELS and tick & ((1 << (BITS*level)) - 1) == 0:
+            levels.append(level)
+            level += 1
+        for level in reversed(levels):
+            slot = self.wheel[level][(tick >> (BITS*level)) & MASK]
+            if not slot:
+                continue
+            timers = list(slot)
+            slot.clear()
+            self.counts[level] -= len(timers)
+            self.timers -= len(timers)
+            for timer in timers:
+                timer.slot = None
+                self.place(timer)
 
-    def cancel(self,event):
-        self.scheduler.cancel(event)
+    def advance(self,limit=None):
+        ''' Move timers from the wheel into the heap, up to and including
+            the slot for tick limit. If limit is None, stop after the
+            first slot that holds any timers.'''
+        wheel = self.wheel[0]
+        counts = self.counts
+        while self.timers:
+            tick = self.wheel_tick
+            if limit is not None and tick > limit:
+                return
+            if tick & MASK == 0:
+                self.cascade(tick)
+            slot = wheel[tick & MASK]
+            if slot:
+                for timer in slot:
+                    timer.slot = None
+                    self.push(timer)
+                counts[0] -= len(slot)
+                self.timers -= len(slot)
+                slot.clear()
+                self.wheel_tick = tick + 1
+                if limit is None:
+                    return
+                continue
+            # skip ahead to the next slot that could hold a timer
+            level = 0
+            while counts[level] == 0:
+                level += 1
+            shift = BITS*level
+            tick = ((tick >> shift) + 1) << shift
+            if limit is not None and tick > limit + 1:
+                tick = limit + 1
+            self.wheel_tick = tick
+        if limit is not None and self.wheel_tick <= limit:
+            self.wheel_tick = limit + 1
 
     def run(self):
-        self.scheduler.run()
+        queue = self.queue
+        immediate = self.immediate
+        pop = heapq.heappop
+        while True:
+            if immediate:
+                if self.timers:
+                    self.advance(int(self.current / self.tick))
+                if not queue or immediate[0] < queue[0]:
+                    # the entry is for the current time, so the clock
+                    # does not move
+                    entry = immediate.popleft()
+                    handler = entry[2]
+                    if handler is None:
+                        self.cancelled -= 1
+                        continue
+                    entry[2] = None
+                    handler(entry[3])
+                    continue
+            if self.timers:
+                if queue:
+                    self.advance(int(queue[0][0] / self.tick))
+                else:
+                    self.advance()
+            if not queue:
+                break
+            entry = pop(queue)
+            handler = entry[2]
+            if handler is None:
+                self.cancelled -= 1
+                continue
+            # mark the entry as done so a late cancel is harmless
+            entry[2] = None
+            # advance the clock by the elapsed time, as sched did
+            if entry[0] > self.current:
+                self.current += entry[0] - self.current
+            handler(entry[3])
@@ -1,15 +1,52 @@
+import random
+
 import scheduler
 
-class Sim(object):
-    scheduler = scheduler.Scheduler()
-    debug = {}
+class Simulation(object):
+    ''' A simulation context. It owns the scheduler, which holds the
+        clock and the event queue, the random number generator used for
+        link loss, and the set of trace categories that are enabled.
+        Nodes and links are bound to a simulation when they are created,
+        so several simulations can exist in the same process.'''
+    def __init__(self,seed=None):
+        self.scheduler = scheduler.Scheduler()
+        self.random = random.Random(seed)
+        self.debug = {}
+        # writer for binary packet event records, see tracefile.py
+        self.tracer = None
+
+    def reset(self,seed=None):
+        ''' Clear the event queue and the clock. If seed is given, the
+            random number generator is reseeded.'''
+        self.scheduler.reset()
+        if seed is not None:
+            self.random.seed(seed)
+
+    def set_debug(self,kind):
+        self.debug[kind] = True
+
+    def set_tracer(self,tracer):
+        ''' Record packet events with tracer, usually a TraceWriter. Use
+            None to stop recording.'''
+        self.tracer = tracer
 
-    @staticmethod
-    def set_debug(kind):
-        Sim.debug[kind] = True
+    def tracing(self,kind):
+        ''' Return true if trace messages of this kind are enabled. Code
+            on the per-packet path checks this before doing any work to
+            build a message.'''
+        return kind in self.debug
 
-    @staticmethod
-    def trace(kind,message):
-        if kind in Sim.debug:
-            print Sim.scheduler.current_time(),message
+    def trace(self,kind,message,*args):
+        ''' Print a trace message if this kind is enabled. Any extra
+            arguments are formatted into the message with the % operator,
+            which is only done when the message is printed.'''
+        if kind in self.debug:
+            if args:
+                message = message % args
+            print self.scheduler.current_time(),message
 
+# The default simulation, used by any node or link that is not given its
+# own. It draws random numbers from the random module, so random.seed()
+# still controls it.
+Sim = Simulation()
+Sim.random = random
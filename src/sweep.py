@@ -0,0 +1,78 @@
+import sys
+sys.path.append('..')
+
+import itertools
+import multiprocessing
+import time
+
+from src.sim import Simulation
+
+from networks.network import Network
+
+class Sweep(object):
+    ''' Run a scenario once for every point in a parameter grid, spread
+        across a pool of worker processes.
+
+        The scenario is a function called as scenario(net,**params) with
+        a freshly built Network for the configuration file, bound to its
+        own Simulation in net.sim. It sets up routes, applications and
+        any events, and returns either the result of the run or a
+        function that is called with no arguments once the simulation
+        has finished to produce the result. The scenario must be defined
+        at the top level of a module so it can be sent to the workers.
+
+        The grid is either a dictionary mapping each parameter name to a
+        list of values, in which case every combination is run, or a
+        list of parameter dictionaries. The simulation of every run is
+        seeded with seed plus the index of the point, so results do not
+        depend on how runs are assigned to workers.'''
+    def __init__(self,config,scenario,grid,seed=0,processes=None):
+        self.config = config
+        self.scenario = scenario
+        self.grid = grid
+        self.seed = seed
+        self.processes = processes
+
+    def points(self):
+        ''' Return the list of parameter dictionaries to run. '''
+        if isinstance(self.grid,dict):
+            names = sorted(self.grid.keys())
+            values = [self.grid[name] for name in names]
+            return [dict(zip(names,combination))
+                    for combination in itertools.product(*values)]
+        return [dict(params) for params in self.grid]
+
+    def run(self):
+        ''' Run every point and yield one result record per run, in the
+            order the runs finish. Each record is a dictionary with the
+            index of the point, its params, the seed, the result returned
+            by the scenario, the simulated time at the end of the run and
+            the elapsed wall-clock time.'''
+        runs = [(self.config,self.scenario,index,params,self.seed + index)
+                for index,params in enumerate(self.points())]
+        if self.processes == 1:
+            for run in runs:
+                yield run_point(run)
+            return
+        pool = multiprocessing.Pool(self.processes)
+        try:
+            for record in pool.imap_unordered(run_point,runs):
+                yield record
+            pool.close()
+        finally:
+            pool.terminate()
+            pool.join()
+
+def run_point(run):
+    ''' Run one point of a sweep. This is called in a worker process. '''
+    config,scenario,index,params,seed = run
+    start = time.time()
+    sim = Simulation(seed)
+    net = Network(config,sim=sim)
+    result = scenario(net,**params)
+    sim.scheduler.run()
+    if callable(result):
+        result = result()
+    return {'index':index,'params':params,'seed':seed,'result':result,
+            'time':sim.scheduler.current_time(),
+            'elapsed':time.time() - start}
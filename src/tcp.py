@@ -1,7 +1,6 @@
 import sys
 sys.path.append('..')
 
-from src.sim import Sim
 from src.connection import Connection
 from src.tcppacket import TCPPacket
 from src.buffer import SendBuffer,ReceiveBuffer
@@ -9,9 +8,13 @@ from src.buffer import SendBuffer,ReceiveBuffer
 class TCP(Connection):
     ''' A TCP connection between two hosts.'''
     def __init__(self,transport,source_address,source_port,
-                 destination_address,destination_port,app=None,window=1000):
+                 destination_address,destination_port,app=None,window=1000,
+                 pool=None,sack=True,congestion=None,delayed_ack=False,
+                 ack_every=2,ack_delay=0.2):
         Connection.__init__(self,transport,source_address,source_port,
                             destination_address,destination_port,app)
+        # optional PacketPool of TCPPackets to send segments and ACKs from
+        self.pool = pool
 
         ### Sender functionality
 
@@ -27,8 +30,43 @@ class TCP(Connection):
         self.sequence = 0
         # retransmission timer
         self.timer = None
-        # timeout duration in seconds
+        # retransmission timeout in seconds, computed from the smoothed
+        # round-trip time and its variation as in RFC 6298
+        self.rto = 1
+        # timeout duration in seconds; this is the retransmission timeout,
+        # doubled every time the timer fires until new data is acked
         self.timeout = 1
+        self.min_timeout = 0.2
+        self.max_timeout = 60
+        self.srtt = None
+        self.rttvar = None
+        # sequence number of the segment being timed for an RTT sample,
+        # and when it was sent; retransmitted segments are never timed
+        # (Karn's rule)
+        self.rtt_sequence = None
+        self.rtt_time = 0
+        # one past the highest sequence number sent so far
+        self.highest = 0
+        # number of duplicate ACKs received in a row
+        self.duplicates = 0
+        # loss recovery after a fast retransmit: whether it is going on,
+        # the highest sequence number sent when it started, and the
+        # sequence number up to which holes have been retransmitted
+        self.recovering = False
+        self.recover = 0
+        self.hole = 0
+        # highest sequence number sent when the timer last fired;
+        # duplicate ACKs for data sent before then do not start a fast
+        # retransmit (RFC 6582)
+        self.timed_out = 0
+        # ranges of data above the ACK number that the receiver has
+        # reported in SACK blocks, sorted and merged
+        self.sacked = []
+        # congestion control algorithm, see congestion.py; without one,
+        # only the window limits the data outstanding
+        self.congestion = congestion
+        if self.congestion:
+            self.congestion.attach(self)
 
         ### Receiver functionality
 
@@ -37,16 +75,30 @@ class TCP(Connection):
         # ack number to send; represents the largest in-order sequence
         # number not yet received
         self.ack = 0
+        # whether to send SACK blocks, and at most how many
+        self.sack = sack
+        self.sack_blocks = 3
+        # sequence number of the latest segment received
+        self.received = 0
+        # delayed ACKs (RFC 1122): if on, in-order data is ACKed once
+        # ack_every segments have arrived, or ack_delay seconds after
+        # the first one, whichever comes first; a larger ack_every
+        # coalesces more segments into each ACK
+        self.delayed_ack = delayed_ack
+        self.ack_every = ack_every
+        self.ack_delay = ack_delay
+        # segments received but not yet ACKed, and the delayed ACK timer
+        self.unacked = 0
+        self.ack_timer = None
 
-    def trace(self,message):
+    def trace(self,message,*args):
         ''' Print debugging messages. '''
-        Sim.trace("TCP",message)
+        self.sim.trace("TCP",message,*args)
 
     def receive_packet(self,packet):
         ''' Receive a packet from the network layer. '''
-        if packet.ack_number > 0:
-            # handle ACK
-            self.handle_ack(packet)
+        # handle ACK; every packet carries one
+        self.handle_ack(packet)
         if packet.length > 0:
             # handle data
             self.handle_data(packet)
@@ -54,59 +106,279 @@ class TCP(Connection):
     ''' Sender '''
 
     def send(self,data):
-        ''' Send data on the connection. Called by the application. This
-            code currently sends all data immediately. '''
-        self.send_packet(data,self.sequence)
-        self.timer = Sim.scheduler.add(delay=self.timeout, event='retransmit', handler=self.retransmit)
+        ''' Send data on the connection. Called by the application. The
+            data is added to the send buffer and sent as soon as the
+            window allows.'''
+        self.send_buffer.put(data)
+        self.fill_window()
+
+    def fill_window(self):
+        ''' Send as much buffered data as the window allows, in segments
+            of at most mss bytes. To avoid sending many small segments, a
+            segment smaller than mss is only sent if it is the last of
+            the data or nothing else is outstanding.'''
+        while self.send_buffer.available() > 0:
+            self.skip_sacked()
+            if self.send_buffer.available() <= 0:
+                break
+            room = self.send_window() - self.send_buffer.outstanding()
+            if room <= 0:
+                break
+            size = min(self.mss,self.send_buffer.available())
+            if room < size and self.send_buffer.outstanding() > 0:
+                break
+            data,sequence = self.send_buffer.get(min(size,room))
+            if sequence >= self.highest:
+                # new data; time it if no other segment is being timed
+                if self.rtt_sequence is None:
+                    self.rtt_sequence = sequence
+                    self.rtt_time = self.sim.scheduler.current_time()
+                self.highest = sequence + len(data)
+            self.send_packet(data,sequence)
+
+    def skip_sacked(self):
+        ''' Skip over data the receiver has, according to its SACK
+            blocks, when sending again after a timeout. '''
+        for start,stop in self.sacked:
+            if start <= self.send_buffer.next < stop:
+                self.send_buffer.next = stop
+
+    def send_window(self):
+        ''' Return the number of bytes that may be outstanding. '''
+        if self.congestion:
+            return min(self.window,int(self.congestion.cwnd))
+        return self.window
+
+    def new_packet(self,**fields):
+        ''' Return a new TCPPacket, taken from the pool if there is one. '''
+        if self.pool:
+            return self.pool.get(**fields)
+        return TCPPacket(**fields)
 
     def send_packet(self,data,sequence):
-        packet = TCPPacket(source_address=self.source_address,
-                           source_port=self.source_port,
-                           destination_address=self.destination_address,
-                           destination_port=self.destination_port,
-                           body=data,
-                           sequence=sequence,ack_number=self.ack)
+        packet = self.new_packet(source_address=self.source_address,
+                                 source_port=self.source_port,
+                                 destination_address=self.destination_address,
+                                 destination_port=self.destination_port,
+                                 body=data,flow=self.flow,
+                                 sequence=sequence,ack_number=self.ack)
+        # the segment carries the ACK, so no separate one is needed
+        if self.unacked:
+            self.ack_sent()
 
         # send the packet
-        self.trace("%s (%d) sending TCP segment to %d for %d" % (self.node.hostname,self.source_address,self.destination_address,packet.sequence))
+        if self.sim.tracing("TCP"):
+            self.trace("%s (%d) sending TCP segment to %d for %d",self.node.hostname,self.source_address,self.destination_address,packet.sequence)
         self.transport.send_packet(packet)
 
         # set a timer
         if not self.timer:
-            self.timer = Sim.scheduler.add(delay=self.timeout, event='retransmit', handler=self.retransmit)
+            self.timer = self.sim.scheduler.add_timer(delay=self.timeout, event='retransmit', handler=self.retransmit)
 
     def handle_ack(self,packet):
-        ''' Handle an incoming ACK. '''
-        self.cancel_timer()
+        ''' Handle an incoming ACK. The ACK is cumulative, so it slides the
+            window forward to the ack number, unless it is old. An ACK
+            without data that does not move the window is a duplicate.'''
+        if packet.ack_number < self.sequence:
+            return
+        self.update_sacked(packet.sack,packet.ack_number)
+        if packet.ack_number == self.sequence:
+            if packet.length == 0 and self.send_buffer.outstanding() > 0:
+                self.duplicate_ack()
+            return
+        now = self.sim.scheduler.current_time()
+        rtt = None
+        if self.rtt_sequence is not None and packet.ack_number > self.rtt_sequence:
+            rtt = now - self.rtt_time
+            self.update_timeout(rtt)
+            self.rtt_sequence = None
+        acked = packet.ack_number - self.sequence
+        self.sequence = packet.ack_number
+        self.send_buffer.slide(self.sequence)
+        self.duplicates = 0
+        self.timeout = self.rto
+        if self.recovering:
+            if self.sequence >= self.recover:
+                self.recovering = False
+                if self.congestion:
+                    self.congestion.recovered(now)
+            elif not self.congestion or self.congestion.partial(now,acked):
+                # partial ACK; the data at the front is also missing
+                self.retransmit_holes()
+            else:
+                self.recovering = False
+        elif self.congestion:
+            self.congestion.acked(now,acked,rtt)
+        if self.congestion:
+            self.congestion.record(now)
+        if self.send_buffer.outstanding() > 0:
+            # restart the timer for the data still outstanding
+            self.sim.scheduler.reset_timer(self.timer,self.timeout)
+        else:
+            self.cancel_timer()
+        self.fill_window()
+
+    def update_sacked(self,blocks,sequence):
+        ''' Merge the SACK blocks of an ACK into the ranges the receiver
+            is known to have, and drop the ranges below the ACK number.'''
+        if not blocks and (not self.sacked or self.sacked[0][1] > sequence):
+            return
+        sacked = []
+        for start,end in sorted(self.sacked + (blocks or [])):
+            if end <= sequence:
+                continue
+            if sacked and start <= sacked[-1][1]:
+                sacked[-1] = (sacked[-1][0],max(sacked[-1][1],end))
+            else:
+                sacked.append((start,end))
+        self.sacked = sacked
+
+    def duplicate_ack(self):
+        ''' Handle a duplicate ACK. The third one in a row starts a fast
+            retransmit. '''
+        self.duplicates += 1
+        now = self.sim.scheduler.current_time()
+        if self.recovering:
+            if self.congestion:
+                self.congestion.duplicate(now)
+            self.retransmit_holes()
+        elif self.duplicates == 3 and self.sequence >= self.timed_out:
+            self.trace("%s (%d) fast retransmit of %d",self.node.hostname,self.source_address,self.sequence)
+            self.recovering = True
+            self.recover = self.highest
+            self.hole = self.sequence
+            if self.congestion:
+                self.congestion.loss(now)
+            self.retransmit_holes()
+        else:
+            return
+        if self.congestion:
+            self.congestion.record(now)
+            self.fill_window()
+
+    def retransmit_holes(self):
+        ''' Retransmit the data the receiver is missing that has not been
+            retransmitted yet during this recovery. The missing data is
+            the gaps below the highest SACK block; without SACK blocks,
+            it is the segment at the front of the window.'''
+        if self.sacked:
+            end = self.sacked[-1][1]
+        else:
+            end = self.sequence + self.mss
+        position = max(self.hole,self.sequence)
+        for start,stop in self.sacked + [(end,end)]:
+            while position < start:
+                data = self.send_buffer.peek(position,min(self.mss,start - position))
+                if len(data) == 0:
+                    break
+                if self.rtt_sequence is not None and position <= self.rtt_sequence < position + len(data):
+                    self.rtt_sequence = None
+                self.send_packet(data,position)
+                position += len(data)
+            position = max(position,stop)
+        self.hole = position
+
+    def update_timeout(self,rtt):
+        ''' Update the smoothed round-trip time and its variation with a
+            new sample, and compute the retransmission timeout from
+            them. '''
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt/2
+        else:
+            self.rttvar = 0.75*self.rttvar + 0.25*abs(self.srtt - rtt)
+            self.srtt = 0.875*self.srtt + 0.125*rtt
+        self.rto = min(max(self.srtt + 4*self.rttvar,self.min_timeout),self.max_timeout)
+        self.timeout = self.rto
 
     def retransmit(self,event):
-        ''' Retransmit data. '''
-        self.trace("%s (%d) retransmission timer fired" % (self.node.hostname,self.source_address))
+        ''' Retransmit the oldest outstanding segment and back off the
+            timeout. Everything else that was outstanding is sent again
+            as the window opens.'''
+        self.timer = None
+        self.trace("%s (%d) retransmission timer fired",self.node.hostname,self.source_address)
+        self.timeout = min(2*self.timeout,self.max_timeout)
+        self.rtt_sequence = None
+        self.recovering = False
+        self.duplicates = 0
+        self.timed_out = self.highest
+        if self.congestion:
+            now = self.sim.scheduler.current_time()
+            self.congestion.timeout(now)
+            self.congestion.record(now)
+        data,sequence = self.send_buffer.resend(self.mss)
+        if len(data) > 0:
+            self.send_packet(data,sequence)
 
     def cancel_timer(self):
         ''' Cancel the timer. '''
         if not self.timer:
             return
-        Sim.scheduler.cancel(self.timer)
+        self.sim.scheduler.cancel_timer(self.timer)
         self.timer = None
 
     ''' Receiver '''
 
     def handle_data(self,packet):
-        ''' Handle incoming data. This code currently gives all data to
-            the application, regardless of whether it is in order, and sends
-            an ACK.'''
-        self.trace("%s (%d) received TCP segment from %d for %d" % (self.node.hostname,packet.destination_address,packet.source_address,packet.sequence))
-        self.app.receive_data(packet.body)
+        ''' Handle incoming data. The data is put into the receive buffer,
+            any data that is now in order is given to the application,
+            and a cumulative ACK is sent.'''
+        if self.sim.tracing("TCP"):
+            self.trace("%s (%d) received TCP segment from %d for %d",self.node.hostname,packet.destination_address,packet.source_address,packet.sequence)
+        self.received = packet.sequence
+        self.receive_buffer.put(packet.body,packet.sequence)
+        data,start = self.receive_buffer.get()
+        if data:
+            self.app.receive_data(data)
+        self.ack = self.receive_buffer.base
+        # ACK at once unless the segment is the next one expected and
+        # does not fill a gap, so that the sender sees duplicate ACKs
+        # and repaired holes without delay
+        if not self.delayed_ack or packet.sequence != start or len(data) != packet.length:
+            self.send_ack()
+            return
+        self.unacked += 1
+        if self.unacked >= self.ack_every:
+            self.send_ack()
+        elif not self.ack_timer:
+            self.ack_timer = self.sim.scheduler.add_timer(delay=self.ack_delay, event='ack', handler=self.delayed_ack_timeout)
+
+    def delayed_ack_timeout(self,event):
+        ''' Send the ACK that was delayed. '''
+        self.ack_timer = None
         self.send_ack()
 
+    def ack_sent(self):
+        ''' Note that everything received so far has been ACKed. '''
+        self.unacked = 0
+        if self.ack_timer:
+            self.sim.scheduler.cancel_timer(self.ack_timer)
+            self.ack_timer = None
+
+    def order_blocks(self,blocks):
+        ''' Return the SACK blocks to send. As in RFC 2018, the first
+            block holds the latest segment received, so that the sender
+            learns about every block over a series of ACKs.'''
+        for i,(start,end) in enumerate(blocks):
+            if start <= self.received < end:
+                blocks.insert(0,blocks.pop(i))
+                break
+        return blocks[:self.sack_blocks]
+
     def send_ack(self):
         ''' Send an ack. '''
-        packet = TCPPacket(source_address=self.source_address,
-                           source_port=self.source_port,
-                           destination_address=self.destination_address,
-                           destination_port=self.destination_port,
-                           sequence=self.sequence,ack_number=self.ack)
+        self.ack_sent()
+        packet = self.new_packet(source_address=self.source_address,
+                                 source_port=self.source_port,
+                                 destination_address=self.destination_address,
+                                 destination_port=self.destination_port,
+                                 flow=self.flow,
+                                 sequence=self.sequence,ack_number=self.ack)
+        if self.sack:
+            blocks = self.receive_buffer.blocks()
+            if blocks:
+                packet.sack = self.order_blocks(blocks)
         # send the packet
-        self.trace("%s (%d) sending TCP ACK to %d for %d" % (self.node.hostname,self.source_address,self.destination_address,packet.ack_number))
+        if self.sim.tracing("TCP"):
+            self.trace("%s (%d) sending TCP ACK to %d for %d",self.node.hostname,self.source_address,self.destination_address,packet.ack_number)
         self.transport.send_packet(packet)
@@ -1,10 +1,13 @@
 from packet import Packet
 
 class TCPPacket(Packet):
+    __slots__ = ['sequence','ack_number','sack','flow']
+
     def __init__(self,source_address=1,source_port=0,
                  destination_address=1,destination_port=0,
                  ident=0,ttl=100,protocol="TCP",body="",length=0,
-                 syn=False,ack=False,fin=False,sequence=0,ack_number=0):
+                 syn=False,ack=False,fin=False,sequence=0,ack_number=0,
+                 sack=None,flow=None):
         Packet.__init__(self,source_address=source_address,
                         source_port=source_port,
                         destination_address=destination_address,
@@ -13,3 +16,9 @@ class TCPPacket(Packet):
                         body=body,length=length)
         self.sequence = sequence
         self.ack_number = ack_number
+        # selective ACK blocks, as a list of (start, end) sequence numbers
+        # of data received out of order
+        self.sack = sack
+        # flow id of the packet, see transport.flow_id; if it is None,
+        # the transport computes it from the addresses and ports
+        self.flow = flow
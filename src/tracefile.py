@@ -0,0 +1,180 @@
+import mmap
+import optparse
+import struct
+
+# event types
+ENQUEUE = 1
+DROP = 2
+TRANSMIT = 3
+ARRIVE = 4
+DELIVER = 5
+
+names = {ENQUEUE:'enqueue',DROP:'drop',TRANSMIT:'transmit',
+         ARRIVE:'arrive',DELIVER:'deliver'}
+
+# Each record holds the time, event type, node id, link id, packet ident,
+# packet length, source address, destination address, source port,
+# destination port, and the queueing, transmission and propagation delay
+# of the packet so far.
+RECORD = struct.Struct('<dBIIIIIIHHddd')
+
+class TraceWriter(object):
+    ''' Writes packet events to a file as fixed-width binary records.
+        Records are packed into a buffer that is written out when it
+        fills, so tracing costs no system call per event. Node ids are
+        assigned in the order nodes are first seen; the hostname of each
+        id is written, one per line, to a file with the same name plus
+        ".nodes" when the writer is closed. The link id of a record is
+        the address of the link, or 0 for events that are not on a link.
+
+        A writer is attached to a simulation with Simulation.set_tracer,
+        and must be closed once the simulation has finished.'''
+    def __init__(self,filename,buffer_records=4096):
+        self.filename = filename
+        self.file = open(filename,'wb')
+        self.buffer = bytearray(RECORD.size*buffer_records)
+        self.offset = 0
+        self.nodes = {}
+        self.hostnames = []
+
+    def node_id(self,node):
+        if node.hostname not in self.nodes:
+            self.nodes[node.hostname] = len(self.hostnames)
+            self.hostnames.append(node.hostname)
+        return self.nodes[node.hostname]
+
+    def record(self,time,kind,node,link,packet):
+        ''' Record an event for a packet at a node. Link may be None. '''
+        RECORD.pack_into(self.buffer,self.offset,time,kind,
+                         self.node_id(node),link.address if link else 0,
+                         packet.ident,packet.length,
+                         packet.source_address,packet.destination_address,
+                         packet.source_port,packet.destination_port,
+                         packet.queueing_delay,packet.transmission_delay,
+                         packet.propagation_delay)
+        self.offset += RECORD.size
+        if self.offset == len(self.buffer):
+            self.flush()
+
+    def flush(self):
+        self.file.write(self.buffer[:self.offset])
+        self.offset = 0
+
+    def close(self):
+        self.flush()
+        self.file.close()
+        with open(self.filename + '.nodes','w') as f:
+            for hostname in self.hostnames:
+                f.write(hostname + '\n')
+
+class TraceReader(object):
+    ''' Reads a trace written by TraceWriter. The file is memory mapped,
+        so records are only decoded when a query reads them.'''
+    def __init__(self,filename):
+        self.file = open(filename,'rb')
+        self.map = None
+        self.count = 0
+        self.file.seek(0,2)
+        size = self.file.tell()
+        if size > 0:
+            self.map = mmap.mmap(self.file.fileno(),0,access=mmap.ACCESS_READ)
+            self.count = size / RECORD.size
+        self.hostnames = []
+        try:
+            with open(filename + '.nodes') as f:
+                self.hostnames = f.read().split()
+        except IOError:
+            pass
+
+    def close(self):
+        if self.map:
+            self.map.close()
+        self.file.close()
+
+    def __len__(self):
+        return self.count
+
+    def records(self,kind=None):
+        ''' Iterate over all records, or only those of one event type.
+            Each record is a tuple in the order of the fields in RECORD.'''
+        unpack = RECORD.unpack_from
+        size = RECORD.size
+        for offset in xrange(0,self.count*size,size):
+            record = unpack(self.map,offset)
+            if kind is None or record[1] == kind:
+                yield record
+
+    def hostname(self,node):
+        if node < len(self.hostnames):
+            return self.hostnames[node]
+        return str(node)
+
+    def link_throughput(self):
+        ''' Return a dictionary mapping each link id to its throughput in
+            bits per second, measured over the time from the first to the
+            last packet sent on that link.'''
+        first = {}
+        last = {}
+        bits = {}
+        for record in self.records(TRANSMIT):
+            time,link,length = record[0],record[3],record[5]
+            if link not in first:
+                first[link] = time
+                bits[link] = 0
+            last[link] = time
+            bits[link] += 8*length
+        throughput = {}
+        for link in bits:
+            duration = last[link] - first[link]
+            throughput[link] = bits[link] / duration if duration > 0 else 0.0
+        return throughput
+
+    def flow_delays(self):
+        ''' Return a dictionary mapping each flow, a tuple of (source
+            address, source port, destination address, destination
+            port), to the list of end-to-end delays of the packets
+            delivered for that flow.'''
+        delays = {}
+        for record in self.records(DELIVER):
+            flow = (record[6],record[8],record[7],record[9])
+            delays.setdefault(flow,[]).append(record[10] + record[11] + record[12])
+        return delays
+
+    def delay_cdf(self,flow):
+        ''' Return the delay CDF of a flow as a list of (delay, fraction
+            of packets with at most this delay) pairs.'''
+        return cdf(self.flow_delays().get(flow,[]))
+
+def cdf(values):
+    ''' Return the CDF of a list of values as a list of (value, fraction
+        of values at most this value) pairs.'''
+    values = sorted(values)
+    total = float(len(values))
+    return [(value,(i+1)/total) for i,value in enumerate(values)]
+
+if __name__ == '__main__':
+    parser = optparse.OptionParser(usage = "%prog [options] tracefile",
+                                   version = "%prog 0.1")
+    parser.add_option("-t","--throughput",action="store_true",dest="throughput",
+                      default=False,
+                      help="print the throughput of each link")
+    parser.add_option("-c","--cdf",action="store_true",dest="cdf",
+                      default=False,
+                      help="print the delay CDF of each flow")
+    (options,args) = parser.parse_args()
+    if len(args) != 1:
+        parser.error("a trace file is required")
+
+    reader = TraceReader(args[0])
+    if options.throughput:
+        for link,throughput in sorted(reader.link_throughput().items()):
+            print link,throughput
+    if options.cdf:
+        delays = reader.flow_delays()
+        for flow in sorted(delays):
+            for delay,fraction in cdf(delays[flow]):
+                print "%d:%d-%d:%d" % flow,delay,fraction
+    if not options.throughput and not options.cdf:
+        for record in reader.records():
+            print record[0],names[record[1]],reader.hostname(record[2]),' '.join([str(field) for field in record[3:]])
+    reader.close()
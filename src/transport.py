@@ -1,23 +1,87 @@
-from sim import Sim
+# largest address or port that fits in a flow id
+MAX_FIELD = 0xffff
+
+def flow_id(source_address,source_port,destination_address,destination_port):
+    ''' Return the integer that identifies the flow of packets with
+        these addresses and ports. Each must be between 0 and MAX_FIELD;
+        use check_flow where a flow id is created from values that may
+        not be.'''
+    return ((source_address << 48) | (source_port << 32) |
+            (destination_address << 16) | destination_port)
+
+def check_flow(*values):
+    ''' Raise ValueError if any address or port does not fit in a flow
+        id, since it would collide with the id of another flow. '''
+    for value in values:
+        if not 0 <= value <= MAX_FIELD:
+            raise ValueError("address or port %r does not fit in a flow id" % (value,))
 
 class Transport(object):
     def __init__(self,node):
         self.node = node
+        self.sim = node.sim
+        # connections keyed by the flow id of the packets they receive
         self.binding = {}
+        # factories for connections to listening ports, keyed by port
+        self.listeners = {}
         self.node.add_protocol(protocol="TCP",handler=self)
 
+    def trace(self,message,*args):
+        self.sim.trace("Transport",message,*args)
+
     def bind(self,connection,source_address,source_port,
              destination_address,destination_port):
         # setup binding so that packets we receive for this combination
         # are sent to the right socket
-        tuple = (destination_address,destination_port,
-                 source_address,source_port)
-        self.binding[tuple] = connection
+        check_flow(source_address,source_port,destination_address,
+                   destination_port)
+        flow = flow_id(destination_address,destination_port,
+                       source_address,source_port)
+        self.binding[flow] = connection
+
+    def unbind(self,source_address,source_port,
+               destination_address,destination_port):
+        check_flow(source_address,source_port,destination_address,
+                   destination_port)
+        flow = flow_id(destination_address,destination_port,
+                       source_address,source_port)
+        if flow in self.binding:
+            del self.binding[flow]
+
+    def listen(self,port,factory):
+        ''' Accept connections to a port. When a packet arrives for a
+            flow to this port that has no connection, a connection is
+            created by calling factory(transport, source_address,
+            source_port, destination_address, destination_port), with the
+            addresses and ports as seen from this end. The connection
+            must bind itself to the transport, as Connection does, and
+            is then given the packet. For example,
+            functools.partial(TCP,app=app) creates TCP connections that
+            deliver data to app.'''
+        check_flow(port)
+        self.listeners[port] = factory
 
     def receive_packet(self,packet):
-        tuple = (packet.source_address,packet.source_port,
-                 packet.destination_address,packet.destination_port)
-        self.binding[tuple].receive_packet(packet)
+        flow = packet.flow
+        if flow is None:
+            try:
+                check_flow(packet.source_address,packet.source_port,
+                           packet.destination_address,packet.destination_port)
+            except ValueError:
+                self.trace("%s dropping packet with an address or port out of range",self.node.hostname)
+                return
+            flow = flow_id(packet.source_address,packet.source_port,
+                           packet.destination_address,packet.destination_port)
+        connection = self.binding.get(flow)
+        if connection is None:
+            factory = self.listeners.get(packet.destination_port)
+            if factory is None:
+                self.trace("%s dropping packet for port %d with no connection",self.node.hostname,packet.destination_port)
+                return
+            connection = factory(self,packet.destination_address,
+                                 packet.destination_port,
+                                 packet.source_address,packet.source_port)
+        connection.receive_packet(packet)
 
     def send_packet(self,packet):
-        Sim.scheduler.add(delay=0, event=packet, handler=self.node.send_packet)
+        self.sim.scheduler.add(delay=0, event=packet, handler=self.node.send_packet)
@@ -0,0 +1,132 @@
+import random
+import unittest
+
+from src.buffer import SendBuffer,ReceiveBuffer
+
+class SendBufferTest(unittest.TestCase):
+    def test_get(self):
+        buffer = SendBuffer()
+        buffer.put('hello world')
+        self.assertEqual(buffer.available(),11)
+        data,sequence = buffer.get(5)
+        self.assertIsInstance(data,memoryview)
+        self.assertEqual((data.tobytes(),sequence),('hello',0))
+        self.assertEqual(buffer.outstanding(),5)
+        data,sequence = buffer.get(100)
+        self.assertEqual((data.tobytes(),sequence),(' world',5))
+        self.assertEqual(buffer.available(),0)
+        data,sequence = buffer.get(100)
+        self.assertEqual((data.tobytes(),sequence),('',11))
+
+    def test_resend(self):
+        buffer = SendBuffer()
+        buffer.put('hello world')
+        buffer.get(8)
+        data,sequence = buffer.resend(3,reset=False)
+        self.assertEqual((data.tobytes(),sequence),('hel',0))
+        self.assertEqual(buffer.outstanding(),8)
+        data,sequence = buffer.resend(3)
+        self.assertEqual((data.tobytes(),sequence),('hel',0))
+        # the rest of the outstanding data is sent again
+        self.assertEqual(buffer.outstanding(),3)
+        self.assertEqual(buffer.get(100)[0].tobytes(),'lo world')
+        self.assertEqual(buffer.peek(6,3).tobytes(),'wor')
+
+    def test_slide(self):
+        buffer = SendBuffer()
+        buffer.put('hello world')
+        buffer.get(5)
+        buffer.slide(3)
+        self.assertEqual((buffer.base,buffer.outstanding()),(3,2))
+        self.assertEqual(buffer.resend(100,reset=False)[0].tobytes(),'lo world')
+        # an ACK past the data sent moves next along with it
+        buffer.slide(8)
+        self.assertEqual((buffer.next,buffer.available()),(8,3))
+        data,sequence = buffer.get(100)
+        self.assertEqual((data.tobytes(),sequence),('rld',8))
+
+    def test_grow_while_outstanding(self):
+        buffer = SendBuffer(capacity=8)
+        sent = []
+        message = ''.join(chr(ord('a') + i % 26) for i in range(10000))
+        position = 0
+        while buffer.base < len(message):
+            if position < len(message):
+                buffer.put(message[position:position+300])
+                position += 300
+            for i in range(3):
+                data,sequence = buffer.get(100)
+                if len(data):
+                    sent.append((data,sequence))
+            # ack only part of what was sent, so the buffer grows while
+            # there are views of the old one
+            buffer.slide(min(buffer.base + 250,buffer.next))
+        self.assertGreater(len(buffer.buffer),8)
+        self.assertEqual(buffer.outstanding(),0)
+        # the data that was handed out did not change
+        self.assertEqual(''.join(data.tobytes() for data,sequence in sent),message)
+        for data,sequence in sent:
+            self.assertEqual(data.tobytes(),message[sequence:sequence+len(data)])
+
+class ReceiveBufferTest(unittest.TestCase):
+    def test_in_order(self):
+        buffer = ReceiveBuffer()
+        buffer.put('hello',0)
+        buffer.put(' world',5)
+        data,start = buffer.get()
+        self.assertEqual(data,'hello world')
+        self.assertEqual(start,0)
+        self.assertEqual(buffer.get(),(bytearray(),11))
+
+    def test_out_of_order(self):
+        buffer = ReceiveBuffer()
+        buffer.put('world',6)
+        buffer.put('!',12)
+        self.assertEqual(buffer.get(),(bytearray(),0))
+        self.assertEqual(buffer.blocks(),[(6,11),(12,13)])
+        buffer.put('hello ',0)
+        data,start = buffer.get()
+        self.assertEqual(str(data),'hello world')
+        self.assertEqual(buffer.blocks(),[(12,13)])
+        buffer.put('x',11)
+        self.assertEqual(str(buffer.get()[0]),'x!')
+        self.assertEqual(buffer.blocks(),[])
+
+    def test_extend_range(self):
+        buffer = ReceiveBuffer()
+        buffer.put('world',6)
+        buffer.put('o wo',4)
+        buffer.put('rld!',8)
+        buffer.put('lo world!!',3)
+        self.assertEqual(buffer.blocks(),[(3,13)])
+        buffer.put('hel',0)
+        self.assertEqual(str(buffer.get()[0]),'hello world!!')
+
+    def test_hole_at_front(self):
+        buffer = ReceiveBuffer()
+        for sequence in range(10,10000,10):
+            buffer.put('x'*10,sequence)
+        self.assertEqual(buffer.blocks(),[(10,10000)])
+        self.assertEqual(buffer.get(),(bytearray(),0))
+        buffer.put('y'*10,0)
+        self.assertEqual(str(buffer.get()[0]),'y'*10 + 'x'*9990)
+
+    def test_random_segments(self):
+        rng = random.Random(1)
+        message = ''.join(chr(rng.randrange(32,127)) for i in range(5000))
+        buffer = ReceiveBuffer()
+        received = []
+        for i in range(2000):
+            start = rng.randrange(len(message))
+            end = min(start + rng.randrange(1,100),len(message))
+            buffer.put(message[start:end],start)
+            data,sequence = buffer.get()
+            self.assertEqual(sequence,len(''.join(received)))
+            received.append(str(data))
+        buffer.put(message,0)
+        received.append(str(buffer.get()[0]))
+        self.assertEqual(''.join(received),message)
+        self.assertEqual(buffer.blocks(),[])
+
+if __name__ == '__main__':
+    unittest.main()
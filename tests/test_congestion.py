@@ -0,0 +1,182 @@
+import unittest
+
+from src.congestion import Reno,NewReno,CUBIC
+from src.sim import Simulation
+
+class FakeBuffer(object):
+    def __init__(self):
+        self.bytes = 0
+
+    def outstanding(self):
+        return self.bytes
+
+class FakeTCP(object):
+    ''' The parts of a TCP connection that congestion control uses. '''
+    def __init__(self):
+        self.mss = 1000
+        self.sim = Simulation()
+        self.srtt = 0.1
+        self.sequence = 0
+        self.highest = 0
+        self.send_buffer = FakeBuffer()
+
+    def send(self,size):
+        self.highest += size
+        self.send_buffer.bytes += size
+
+    def ack(self,size):
+        self.sequence += size
+        self.send_buffer.bytes -= size
+
+class CongestionTest(unittest.TestCase):
+    algorithm = Reno
+
+    def setUp(self):
+        self.tcp = FakeTCP()
+        self.congestion = self.algorithm()
+        self.congestion.attach(self.tcp)
+
+    def test_slow_start(self):
+        self.assertEqual(self.congestion.cwnd,1000)
+        self.congestion.acked(0,1000,0.1)
+        self.assertEqual(self.congestion.cwnd,2000)
+        # at most two segments per ACK
+        self.congestion.acked(0,3000,0.1)
+        self.assertEqual(self.congestion.cwnd,4000)
+
+    def test_timeout(self):
+        self.congestion.cwnd = 8000
+        self.tcp.send(8000)
+        self.congestion.timeout(1)
+        self.assertEqual(self.congestion.cwnd,1000)
+        self.assertEqual(self.congestion.ssthresh,self.timeout_threshold)
+        # the window grows back in slow start
+        self.congestion.acked(1,1000,0.1)
+        self.assertEqual(self.congestion.cwnd,2000)
+
+    timeout_threshold = 4000
+
+class RenoTest(CongestionTest):
+    def test_congestion_avoidance(self):
+        self.congestion.cwnd = self.congestion.ssthresh = 4000
+        for i in range(4):
+            self.congestion.acked(0,1000,0.1)
+        # about one segment per window of data acked
+        self.assertAlmostEqual(self.congestion.cwnd,4920.6,delta=0.1)
+
+    def test_loss(self):
+        self.congestion.cwnd = 8000
+        self.tcp.send(8000)
+        self.congestion.loss(0)
+        self.assertEqual(self.congestion.ssthresh,4000)
+        self.assertEqual(self.congestion.cwnd,7000)
+        self.congestion.duplicate(0)
+        self.assertEqual(self.congestion.cwnd,8000)
+        # a partial ACK ends recovery
+        self.tcp.ack(1000)
+        self.assertFalse(self.congestion.partial(0,1000))
+        self.assertEqual(self.congestion.cwnd,4000)
+
+    def test_reduce_once(self):
+        self.congestion.cwnd = 8000
+        self.tcp.send(8000)
+        self.congestion.loss(0)
+        self.congestion.recovered(0)
+        # a timeout for data sent before the loss does not halve again
+        self.tcp.ack(1000)
+        self.congestion.timeout(1)
+        self.assertEqual(self.congestion.ssthresh,4000)
+        self.assertEqual(self.congestion.cwnd,1000)
+
+class NewRenoTest(CongestionTest):
+    algorithm = NewReno
+
+    def test_partial(self):
+        self.congestion.cwnd = 8000
+        self.tcp.send(8000)
+        self.congestion.loss(0)
+        self.assertEqual(self.congestion.cwnd,7000)
+        # a partial ACK deflates the window by the data acked, less a
+        # segment, and recovery goes on
+        self.tcp.ack(2000)
+        self.assertTrue(self.congestion.partial(0,2000))
+        self.assertEqual(self.congestion.cwnd,6000)
+        self.tcp.ack(5000)
+        self.congestion.recovered(0)
+        self.assertEqual(self.congestion.cwnd,2000)
+
+    def test_recovered(self):
+        self.congestion.cwnd = 8000
+        self.tcp.send(8000)
+        self.congestion.loss(0)
+        self.tcp.ack(8000)
+        self.tcp.send(5000)
+        self.congestion.recovered(0)
+        self.assertEqual(self.congestion.cwnd,4000)
+
+class CUBICTest(CongestionTest):
+    algorithm = CUBIC
+    # the window at the timeout times beta
+    timeout_threshold = 5600
+
+    def loss(self,now):
+        ''' Lose a segment of a full window of new data and recover,
+            leaving ssthresh bytes outstanding. '''
+        self.tcp.sequence = self.tcp.highest
+        self.tcp.send(self.congestion.cwnd)
+        self.congestion.loss(now)
+        self.tcp.send_buffer.bytes = self.congestion.ssthresh
+        self.congestion.recovered(now)
+
+    def test_loss(self):
+        self.congestion.cwnd = 10000
+        self.loss(0)
+        self.assertEqual(self.congestion.w_max,10000)
+        self.assertAlmostEqual(self.congestion.ssthresh,7000)
+        self.assertAlmostEqual(self.congestion.cwnd,7000)
+
+    def rounds(self,count,rtt):
+        ''' ACK a window of segments every rtt seconds and return the
+            window after each round. '''
+        self.tcp.srtt = rtt
+        windows = []
+        for round in range(1,count + 1):
+            for i in range(int(self.congestion.cwnd/1000)):
+                self.congestion.acked(round*rtt,1000,rtt)
+            windows.append(self.congestion.cwnd)
+        return windows
+
+    def test_cubic_growth(self):
+        self.congestion.cwnd = 10000
+        self.loss(0)
+        windows = self.rounds(12,0.5)
+        growth = [b - a for a,b in zip([7000] + windows,windows)]
+        self.assertTrue(min(growth) > 0)
+        # concave up to the old window, where it grows the least, and
+        # convex beyond it
+        slowest = growth.index(min(growth))
+        self.assertAlmostEqual(windows[slowest],10000,delta=200)
+        self.assertEqual(growth[:slowest + 1],sorted(growth[:slowest + 1],reverse=True))
+        self.assertEqual(growth[slowest:],sorted(growth[slowest:]))
+        self.assertGreater(windows[-1],20000)
+
+    def test_tcp_friendly(self):
+        # with a short RTT the window grows at least as fast as Reno's
+        # would, about half a segment per round for beta 0.7
+        self.congestion.cwnd = 10000
+        self.loss(0)
+        windows = self.rounds(30,0.1)
+        growth = [b - a for a,b in zip(windows,windows[1:])]
+        for size in growth[5:]:
+            self.assertAlmostEqual(size,3*0.3/1.7*1000,delta=50)
+
+    def test_fast_convergence(self):
+        self.congestion.cwnd = 10000
+        self.loss(0)
+        # a loss below the last w_max lowers it further
+        self.loss(1)
+        self.assertAlmostEqual(self.congestion.w_max,7000*1.7/2)
+        self.assertAlmostEqual(self.congestion.cwnd,4900)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,144 @@
+import unittest
+
+from src.discipline import RED,CoDel,DRR
+from src.packet import Packet
+from src.sim import Simulation
+
+class FakeLink(object):
+    ''' The parts of a link that a queue discipline uses. '''
+    def __init__(self,bandwidth=1000000.0):
+        self.bandwidth = bandwidth
+        self.sim = Simulation(seed=1)
+        self.dropped = []
+
+    def drop(self,packet,reason):
+        self.dropped.append(packet)
+
+def packets(count,length=1000,port=0,now=0):
+    result = []
+    for i in range(count):
+        packet = Packet(source_port=port,ident=i,length=length)
+        packet.enter_queue = now
+        result.append(packet)
+    return result
+
+class REDTest(unittest.TestCase):
+    def setUp(self):
+        self.red = RED()
+        self.red.attach(FakeLink())
+
+    def test_below_min_threshold(self):
+        for packet in packets(5):
+            self.assertTrue(self.red.enqueue(packet,0))
+        self.assertEqual(len(self.red),5)
+        self.assertEqual(self.red.bytes,5000)
+        self.assertLess(self.red.average,self.red.min_threshold)
+
+    def test_average_follows_queue(self):
+        accepted = 0
+        for packet in packets(1000):
+            accepted += self.red.enqueue(packet,0)
+        # the average rises toward the queue length, and packets are
+        # dropped early once it passes min_threshold
+        self.assertGreater(self.red.average,self.red.min_threshold)
+        self.assertLess(accepted,1000)
+        self.assertEqual(len(self.red),accepted)
+
+    def test_idle_decay(self):
+        self.red.average = 10.0
+        self.red.enqueue(packets(1)[0],0)
+        self.red.dequeue(0)
+        average = self.red.average
+        # one second at 1 Mbps is 125 packets of 1000 bytes, and one
+        # more for the packet arriving to the empty queue
+        self.red.enqueue(packets(1)[0],1)
+        self.assertAlmostEqual(self.red.average,
+                               average*(1 - self.red.weight)**126)
+
+    def test_decay_after_drop_into_empty_queue(self):
+        # an average above twice max_threshold drops every packet, and
+        # the queue stays empty; the average must still fall
+        self.red.average = 40.0
+        accepted = 0
+        averages = []
+        for packet in packets(1000):
+            accepted += self.red.enqueue(packet,0)
+            averages.append(self.red.average)
+        self.assertGreater(accepted,0)
+        self.assertLess(averages[1],averages[0])
+        self.assertLess(min(averages),2*self.red.max_threshold)
+
+    def test_drop_after_idle(self):
+        # an early drop while the queue is idle does not count the idle
+        # time twice
+        self.red.average = 40.0
+        self.red.enqueue(packets(1)[0],0)
+        self.red.dequeue(0)
+        self.red.average = 40.0
+        self.assertFalse(self.red.enqueue(packets(1)[0],0.001))
+        average = self.red.average
+        self.red.enqueue(packets(1)[0],0.001)
+        self.assertAlmostEqual(self.red.average,average*(1 - self.red.weight))
+
+class CoDelTest(unittest.TestCase):
+    def setUp(self):
+        self.link = FakeLink()
+        self.codel = CoDel()
+        self.codel.attach(self.link)
+
+    def test_short_delay(self):
+        for i,packet in enumerate(packets(100)):
+            packet.enter_queue = 0.01*i
+            self.codel.enqueue(packet,packet.enter_queue)
+        for i in range(100):
+            packet = self.codel.dequeue(0.01*i + 0.001)
+            self.assertEqual(packet.ident,i)
+        self.assertEqual(self.link.dropped,[])
+        self.assertIsNone(self.codel.dequeue(1))
+
+    def test_standing_queue(self):
+        for packet in packets(100):
+            self.codel.enqueue(packet,0)
+        sent = []
+        now = 0.01
+        while self.codel:
+            packet = self.codel.dequeue(now)
+            if packet is not None:
+                sent.append((now,packet))
+            now += 0.01
+        # nothing is dropped until the delay has been above target for
+        # an interval, and then drops come closer together
+        self.assertTrue(self.link.dropped)
+        self.assertEqual(len(sent) + len(self.link.dropped),100)
+        first = [t for t,packet in sent if packet.ident > self.link.dropped[0].ident][0]
+        self.assertGreaterEqual(first,0.01 + self.codel.interval)
+        self.assertGreater(self.codel.count,1)
+
+class DRRTest(unittest.TestCase):
+    def setUp(self):
+        self.drr = DRR(quantum=1500)
+        self.drr.attach(FakeLink())
+
+    def test_fair_bytes(self):
+        for packet in packets(10,length=1500,port=1) + packets(30,length=500,port=2):
+            self.assertTrue(self.drr.enqueue(packet,0))
+        self.assertEqual(len(self.drr),40)
+        self.assertEqual(self.drr.bytes,30000)
+        order = []
+        while self.drr:
+            order.append(self.drr.dequeue(0).source_port)
+        # each round one large packet and three small ones are sent
+        self.assertEqual(order,[1,2,2,2]*10)
+        self.assertEqual(self.drr.bytes,0)
+        self.assertEqual(self.drr.queues,{})
+        self.assertIsNone(self.drr.dequeue(0))
+
+    def test_flow_order(self):
+        for packet in packets(3,length=1500,port=1) + packets(3,length=1500,port=2):
+            self.drr.enqueue(packet,0)
+        order = [(p.source_port,p.ident) for p in
+                 [self.drr.dequeue(0) for i in range(6)]]
+        self.assertEqual(order,[(1,0),(2,0),(1,1),(2,1),(1,2),(2,2)])
+
+if __name__ == '__main__':
+    unittest.main()
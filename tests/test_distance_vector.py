@@ -0,0 +1,156 @@
+import imp
+import os
+import random
+import unittest
+
+from networks.network import Network
+from src.sim import Simulation
+
+# the module name has a dash in it, so it cannot be imported by name
+dv = imp.load_source('distance_vector',
+                     os.path.join(os.path.dirname(__file__),'..','src',
+                                  'distance-vector.py'))
+
+CONFIG = os.path.join(os.path.dirname(__file__),'..','networks',
+                      'five-straight-nodes.txt')
+
+class FakeNode(object):
+    ''' The parts of a node that a routing table uses: one link to each
+        neighbor, named after it. '''
+    def __init__(self,neighbors):
+        self.links = dict((hostname,'link to ' + hostname)
+                          for hostname in neighbors)
+
+    def get_link(self,hostname):
+        return self.links[hostname]
+
+class RefreshTest(unittest.TestCase):
+    def setUp(self):
+        self.node = FakeNode(['a','b','c'])
+        self.table = dv.RoutingTable()
+
+    def update(self,hostname,routes,partial=False):
+        changed = self.table.upsert_neighbor_routing_table(hostname,routes,
+                                                           partial)
+        return changed,self.table.refresh_routing_table(self.node,changed)
+
+    def test_full_update(self):
+        changed,changes = self.update('a',{1:0,2:1})
+        self.assertEqual(changed,set([1,2]))
+        self.assertEqual(changes,{1:'link to a',2:'link to a'})
+        changed,changes = self.update('b',{2:0,3:2})
+        self.assertEqual(changed,set([2,3]))
+        self.assertEqual(changes,{2:'link to b',3:'link to b'})
+        # the same table again changes nothing
+        self.assertEqual(self.update('b',{2:0,3:2}),(set(),{}))
+        self.assertEqual(self.table.get_routing_table(),{1:1,2:1,3:3})
+
+    def test_partial_update(self):
+        self.update('a',{1:0,2:3,3:3})
+        self.update('b',{2:2,3:4})
+        changed,changes = self.update('a',{2:1},partial=True)
+        # only the destination in the update is recomputed
+        self.assertEqual(changed,set([2]))
+        self.assertEqual(changes,{2:'link to a'})
+        self.assertEqual(self.table.neighbor_routing_tables['a'],{1:0,2:1,3:3})
+        self.assertEqual(self.table.get_routing_table(),{1:1,2:2,3:4})
+
+    def test_partial_infinity(self):
+        self.update('a',{1:0,2:1,3:2})
+        self.update('b',{3:4})
+        changed,changes = self.update('a',{2:dv.INFINITY,3:dv.INFINITY},
+                                      partial=True)
+        self.assertEqual(changed,set([2,3]))
+        # the route to 2 is gone, and 3 is now reached through b
+        self.assertEqual(changes,{2:None,3:'link to b'})
+        self.assertEqual(self.table.neighbor_routing_tables['a'],{1:0})
+        self.assertEqual(self.table.get_routing_table(),{1:1,3:5})
+        self.assertEqual(self.table.get_forwarding_table_entries(),
+                         {1:'link to a',3:'link to b'})
+        # a destination no neighbor has is advertised as unreachable
+        self.assertEqual(self.table.get_routing_table(destinations=[2]),
+                         {2:dv.INFINITY})
+
+    def test_poison_reverse(self):
+        self.update('a',{1:0,2:1})
+        self.update('b',{3:0})
+        self.assertEqual(self.table.get_routing_table(link=self.node.get_link('a')),
+                         {1:dv.INFINITY,2:dv.INFINITY,3:1})
+
+    def test_matches_full_refresh(self):
+        rng = random.Random(1)
+        destinations = range(20)
+        for i in range(500):
+            hostname = rng.choice(['a','b','c'])
+            partial = rng.random() < 0.7
+            routes = {}
+            for destination in rng.sample(destinations,rng.randrange(1,8)):
+                routes[destination] = rng.choice(range(dv.INFINITY + 1))
+            self.update(hostname,routes,partial)
+            # a table built from the same neighbor tables from scratch
+            full = dv.RoutingTable()
+            full.neighbor_routing_tables = dict(self.table.neighbor_routing_tables)
+            full.refresh_routing_table(self.node)
+            self.assertEqual(self.table.routing_table,full.routing_table)
+
+class RecordingApp(dv.DistanceVectorApp):
+    ''' Distance vector routing that records every route change as the
+        hostname, destination and cost. '''
+    def __init__(self,node,changes,**kwargs):
+        dv.DistanceVectorApp.__init__(self,node,**kwargs)
+        self.changes = changes
+
+    def update_forwarding_table(self,changes):
+        for destination_address in changes:
+            entry = self.routing_table.routing_table.get(destination_address)
+            cost = entry[0] if entry else dv.INFINITY
+            self.changes.append((self.node.hostname,destination_address,cost))
+        dv.DistanceVectorApp.update_forwarding_table(self,changes)
+
+class CountToInfinityTest(unittest.TestCase):
+    def run_line(self,poison_reverse):
+        ''' Run routing on n1 - n2 - n3 - n4 - n5, take the link between
+            n4 and n5 down after 100 seconds, and return the route
+            changes to n5 after that and the apps. '''
+        sim = Simulation()
+        net = Network(CONFIG,sim=sim)
+        changes = []
+        apps = {}
+        for name,node in net.nodes.items():
+            apps[name] = RecordingApp(node,changes,period=30,timeout=90,
+                                      poison_reverse=poison_reverse,
+                                      rounds=10)
+            node.add_protocol(protocol="dvrouting",handler=apps[name])
+        n4 = net.get_node('n4')
+        n5 = net.get_node('n5')
+        for link in [n4.get_link('n5'),n5.get_link('n4')]:
+            sim.scheduler.add(delay=100,event=None,handler=link.down)
+        for app in apps.values():
+            app.broadcast_routing_table("")
+        before = []
+        sim.scheduler.add(delay=100,event=None,
+                          handler=lambda event: before.extend(changes))
+        sim.scheduler.run()
+        address = n5.get_address('n4')
+        after = [(hostname,cost) for hostname,destination,cost
+                 in changes[len(before):] if destination == address]
+        return after,apps,address
+
+    def test_without_poison_reverse(self):
+        after,apps,address = self.run_line(False)
+        # n4 takes the route n3 learned from it, and the cost goes up
+        # until it reaches infinity
+        costs = [cost for hostname,cost in after if hostname == 'n4']
+        self.assertGreater(len(costs),3)
+        self.assertEqual(costs[-1],dv.INFINITY)
+
+    def test_poison_reverse(self):
+        after,apps,address = self.run_line(True)
+        # every node withdraws its route at once
+        self.assertEqual(sorted(after),[(name,dv.INFINITY) for name in
+                                        ['n1','n2','n3','n4']])
+        for name in ['n1','n2','n3','n4']:
+            self.assertNotIn(address,apps[name].node.forwarding_table)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+import imp
+import os
+import random
+import unittest
+
+# the module name has a dash in it, so it cannot be imported by name
+ls = imp.load_source('link_state',
+                     os.path.join(os.path.dirname(__file__),'..','src',
+                                  'link-state.py'))
+
+def lsa(name,neighbors,sequence):
+    return {'hostname':name,'sequence':sequence,
+            'neighbors':dict(neighbors[name]),'addresses':[]}
+
+class UpdateLinkTest(unittest.TestCase):
+    def build(self,neighbors,root):
+        ''' Return a database with full SPF and one kept up to date with
+            update_link, for the same graph. '''
+        databases = []
+        for i in range(2):
+            database = ls.LinkStateDatabase(root)
+            for name in neighbors:
+                database.install(lsa(name,neighbors,1))
+            database.spf()
+            databases.append(database)
+        self.sequence = 1
+        return databases
+
+    def change(self,full,incremental,neighbors,names):
+        ''' Flood new LSAs from names to both databases. Checks that the
+            hostnames update_link reports include every first hop that
+            changed. '''
+        old_first = dict(incremental.first)
+        reported = set()
+        self.sequence += 1
+        sequence = self.sequence
+        for name in names:
+            full.install(lsa(name,neighbors,sequence))
+            full.spf()
+            for start,end,old_cost,new_cost in incremental.install(lsa(name,neighbors,sequence)):
+                reported |= incremental.update_link(start,end,old_cost,new_cost)
+        for name in set(old_first) | set(incremental.first):
+            if old_first.get(name) != incremental.first.get(name):
+                self.assertIn(name,reported)
+
+    def assertSameRoutes(self,full,incremental):
+        # with paths of equal cost the two may pick different first
+        # hops, so the tree is checked to be consistent instead
+        self.assertEqual(incremental.distance,full.distance)
+        self.assertEqual(set(incremental.first),set(full.first))
+        for name,parent in incremental.parent.items():
+            if parent is None:
+                continue
+            self.assertEqual(incremental.distance[name],
+                             incremental.distance[parent] +
+                             incremental.cost(parent,name))
+            first = name if parent == incremental.root else incremental.first[parent]
+            self.assertEqual(incremental.first[name],first)
+
+    def test_square(self):
+        # a - b
+        # |   |
+        # c - d
+        neighbors = {'a':{'b':1,'c':1},'b':{'a':1,'d':1},
+                     'c':{'a':1,'d':1},'d':{'b':1,'c':1}}
+        full,incremental = self.build(neighbors,'a')
+        first = incremental.first['d']
+        other = 'c' if first == 'b' else 'b'
+        # make the link d uses dearer, and it goes the other way
+        neighbors[first]['d'] = neighbors['d'][first] = 5
+        self.change(full,incremental,neighbors,[first,'d'])
+        self.assertSameRoutes(full,incremental)
+        self.assertEqual(incremental.first,full.first)
+        self.assertEqual(incremental.first['d'],other)
+        self.assertEqual(incremental.distance['d'],2)
+        # take down the other link, and d is back on the dear one
+        del neighbors[other]['d']
+        del neighbors['d'][other]
+        self.change(full,incremental,neighbors,[other,'d'])
+        self.assertSameRoutes(full,incremental)
+        self.assertEqual(incremental.first['d'],first)
+        self.assertEqual(incremental.distance['d'],6)
+        # and cut d off
+        del neighbors[first]['d']
+        del neighbors['d'][first]
+        self.change(full,incremental,neighbors,[first,'d'])
+        self.assertSameRoutes(full,incremental)
+        self.assertNotIn('d',incremental.first)
+
+    def test_random_changes(self):
+        rng = random.Random(1)
+        names = ['n%d' % i for i in range(40)]
+        neighbors = dict((name,{}) for name in names)
+        links = []
+        def connect(a,b,cost):
+            neighbors[a][b] = neighbors[b][a] = cost
+        # a random tree, plus random links
+        for i in range(1,len(names)):
+            links.append((names[i],names[rng.randrange(i)]))
+            connect(links[-1][0],links[-1][1],rng.randrange(1,10))
+        while len(links) < 80:
+            a,b = rng.sample(names,2)
+            if b not in neighbors[a]:
+                links.append((a,b))
+                connect(a,b,rng.randrange(1,10))
+        full,incremental = self.build(neighbors,names[0])
+        self.assertSameRoutes(full,incremental)
+        for i in range(300):
+            a,b = rng.choice(links)
+            choice = rng.random()
+            if b not in neighbors[a]:
+                # bring the link back up
+                connect(a,b,rng.randrange(1,10))
+            elif choice < 0.3:
+                # take the link down
+                del neighbors[a][b]
+                del neighbors[b][a]
+            else:
+                # change its cost, in one direction only at first
+                neighbors[a][b] = rng.randrange(1,10)
+                self.change(full,incremental,neighbors,[a])
+                self.assertSameRoutes(full,incremental)
+                neighbors[b][a] = neighbors[a][b]
+            self.change(full,incremental,neighbors,[a,b])
+            self.assertSameRoutes(full,incremental)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import heapq
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+from networks import network
+from networks.network import Network
+from src.sim import Simulation
+
+def random_config(filename,nodes,degree,rng):
+    ''' Write a configuration file for a random network with mostly
+        two-way links, some one-way links and random delays. '''
+    names = ['n%d' % i for i in range(nodes)]
+    neighbors = dict((name,set()) for name in names)
+    while sum(len(n) for n in neighbors.values()) < degree*nodes:
+        a,b = rng.sample(names,2)
+        neighbors[a].add(b)
+        if rng.random() < 0.9:
+            neighbors[b].add(a)
+    with open(filename,'w') as f:
+        for name in names:
+            if neighbors[name]:
+                f.write("%s %s\n" % (name,' '.join(sorted(neighbors[name]))))
+        f.write("\n")
+        for name in names:
+            for neighbor in sorted(neighbors[name]):
+                f.write("%s %s %dms\n" % (name,neighbor,rng.randrange(1,20)))
+
+def distances(edges,source):
+    ''' Dijkstra over edges, a dictionary mapping (start, end) to (cost,
+        link index). '''
+    neighbors = {}
+    for (start,end),(cost,index) in edges.items():
+        neighbors.setdefault(start,[]).append((end,cost))
+    distance = {source:0}
+    heap = [(0,source)]
+    while heap:
+        d,current = heapq.heappop(heap)
+        if d > distance[current]:
+            continue
+        for end,cost in neighbors.get(current,[]):
+            if end not in distance or d + cost < distance[end]:
+                distance[end] = d + cost
+                heapq.heappush(heap,(d + cost,end))
+    return distance
+
+class VectorizedRoutesTest(unittest.TestCase):
+    def setUp(self):
+        if network.shortest_path is None:
+            self.skipTest("SciPy is not installed")
+        self.directory = tempfile.mkdtemp()
+        self.config = os.path.join(self.directory,'random.txt')
+        random_config(self.config,300,3,random.Random(1))
+        self.net = Network(self.config,sim=Simulation())
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def check(self,metric):
+        cost = network.metrics[metric]
+        names = sorted(self.net.nodes.keys())
+        edges = {}
+        for name in names:
+            for index,l in enumerate(self.net.nodes[name].links):
+                pair = (name,l.endpoint.hostname)
+                if pair not in edges or cost(l) < edges[pair][0]:
+                    edges[pair] = (cost(l),index)
+        expected = self.net.next_hops(names,edges,metric)
+        actual = self.net.vectorized_next_hops(names,edges,metric)
+        all_distances = dict((name,distances(edges,name)) for name in names)
+        for source in names:
+            # the same destinations are reachable
+            self.assertEqual(set(actual[source]),set(expected[source]))
+            # every next hop starts a shortest path; where there are
+            # several, the two may pick different ones
+            for destination,neighbor in actual[source].items():
+                self.assertAlmostEqual(all_distances[source][destination],
+                                       edges[(source,neighbor)][0] +
+                                       all_distances[neighbor][destination])
+
+    def test_hops(self):
+        self.check('hops')
+
+    def test_delay(self):
+        self.check('delay')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import unittest
+
+from src.link import Link
+from src.node import Node
+from src.packet import Packet,PacketPool
+from src.sim import Simulation
+
+class RecordObserver(object):
+    ''' Observer that records the body of every forwarded packet. '''
+    def __init__(self):
+        self.bodies = []
+
+    def forwarded(self,node,packet):
+        self.bodies.append(packet.body)
+
+class ObserverTest(unittest.TestCase):
+    def setUp(self):
+        self.sim = Simulation()
+        self.n1 = Node('n1',sim=self.sim)
+        self.n2 = Node('n2',sim=self.sim)
+        self.link = Link(address=1,startpoint=self.n1,endpoint=self.n2,
+                         queue_size=1,sim=self.sim)
+        self.n1.add_link(self.link)
+        self.observer = RecordObserver()
+        self.n1.set_observer(self.observer)
+        self.pool = PacketPool()
+
+    def test_no_route(self):
+        packet = self.pool.get(destination_address=2,body='data')
+        self.n1.send_packet(packet)
+        self.assertEqual(self.observer.bodies,['data'])
+        # the packet was dropped and went back to the pool
+        self.assertEqual(self.pool.free,[packet])
+
+    def test_full_queue(self):
+        self.n1.add_forwarding_entry(address=2,link=self.link)
+        bodies = ['first','second','third']
+        packets = [self.pool.get(destination_address=2,body=body)
+                   for body in bodies]
+        for packet in packets:
+            self.n1.send_packet(packet)
+        self.assertEqual(self.observer.bodies,bodies)
+        # the first packet is being sent, the second is queued and the
+        # third is dropped
+        self.assertEqual(self.link.dropped,1)
+        self.assertEqual(self.pool.free,[packets[2]])
+
+if __name__ == '__main__':
+    unittest.main()
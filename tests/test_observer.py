@@ -0,0 +1,21 @@
+import unittest
+
+from src.node import Node
+from src.observer import describe
+from src.packet import Packet
+from src.sim import Simulation
+
+class DescribeTest(unittest.TestCase):
+    def test_memoryview_body(self):
+        node = Node('n1',sim=Simulation())
+        data = bytearray('hello world')
+        packet = Packet(destination_address=2,body=memoryview(data)[0:5])
+        self.assertIn('Data: hello;',describe(node,packet))
+
+    def test_string_body(self):
+        node = Node('n1',sim=Simulation())
+        packet = Packet(destination_address=2,body='hello')
+        self.assertIn('Data: hello;',describe(node,packet))
+
+if __name__ == '__main__':
+    unittest.main()
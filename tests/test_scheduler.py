@@ -0,0 +1,198 @@
+import random
+import unittest
+
+from src.scheduler import Scheduler
+
+class Log(object):
+    ''' Handler that records the time and event of every call. '''
+    def __init__(self,scheduler):
+        self.scheduler = scheduler
+        self.calls = []
+
+    def __call__(self,event):
+        self.calls.append((self.scheduler.current_time(),event))
+
+class CancelTest(unittest.TestCase):
+    def setUp(self):
+        self.scheduler = Scheduler()
+        self.log = Log(self.scheduler)
+
+    def test_order(self):
+        for delay,event in [(2,'c'),(1,'a'),(1,'b'),(0,'now')]:
+            self.scheduler.add(delay=delay,event=event,handler=self.log)
+        self.scheduler.run()
+        self.assertEqual(self.log.calls,[(0,'now'),(1,'a'),(1,'b'),(2,'c')])
+
+    def test_cancel(self):
+        a = self.scheduler.add(delay=1,event='a',handler=self.log)
+        self.scheduler.add(delay=2,event='b',handler=self.log)
+        now = self.scheduler.add(delay=0,event='now',handler=self.log)
+        self.scheduler.cancel(a)
+        self.scheduler.cancel(now)
+        # cancelling again does nothing
+        self.scheduler.cancel(a)
+        self.assertEqual(self.scheduler.cancelled,2)
+        self.scheduler.run()
+        self.assertEqual(self.log.calls,[(2,'b')])
+        self.assertEqual(self.scheduler.cancelled,0)
+
+    def test_cancel_after_run(self):
+        a = self.scheduler.add(delay=1,event='a',handler=self.log)
+        self.scheduler.run()
+        self.scheduler.cancel(a)
+        self.assertEqual(self.scheduler.cancelled,0)
+        self.assertEqual(self.log.calls,[(1,'a')])
+
+    def test_compact(self):
+        entries = [self.scheduler.add(delay=i,event=i,handler=self.log)
+                   for i in range(200)]
+        for entry in entries[:150]:
+            self.scheduler.cancel(entry)
+        # the heap was rebuilt once most of it was cancelled
+        self.assertLess(len(self.scheduler.queue),200)
+        self.assertEqual(self.scheduler.cancelled,
+                         len(self.scheduler.queue) - 50)
+        self.scheduler.run()
+        self.assertEqual(self.log.calls,[(i,i) for i in range(150,200)])
+
+    def test_compact_during_run(self):
+        entries = [self.scheduler.add(delay=10 + i,event=i,handler=self.log)
+                   for i in range(200)]
+        def cancel(event):
+            self.log(event)
+            for entry in entries[::2] + entries[1:100:2]:
+                self.scheduler.cancel(entry)
+            # the heap was rebuilt while the simulation is running
+            self.assertLessEqual(len(self.scheduler.queue),100)
+            self.scheduler.add(delay=0,event='after',handler=self.log)
+        self.scheduler.add(delay=5,event='cancel',handler=cancel)
+        self.scheduler.add(delay=5,event='same time',handler=self.log)
+        self.scheduler.run()
+        expected = [(5,'cancel'),(5,'same time'),(5,'after')]
+        expected += [(10 + i,i) for i in range(101,200,2)]
+        self.assertEqual(self.log.calls,expected)
+        self.assertEqual(self.scheduler.cancelled,0)
+        self.assertEqual(self.scheduler.queue,[])
+
+class TimerTest(unittest.TestCase):
+    timer_wheel = True
+
+    def setUp(self):
+        self.scheduler = Scheduler(timer_wheel=self.timer_wheel)
+        self.log = Log(self.scheduler)
+
+    def test_fire(self):
+        self.scheduler.add_timer(delay=0.5,event='timer',handler=self.log)
+        self.scheduler.run()
+        self.assertEqual(self.log.calls,[(0.5,'timer')])
+
+    def test_reset_many_times(self):
+        timer = self.scheduler.add_timer(delay=1,event='timer',handler=self.log)
+        def reset(event):
+            self.scheduler.reset_timer(timer)
+        # every reset pushes the timer back to one second from then
+        for i in range(100):
+            self.scheduler.add(delay=0.1*i,event=i,handler=reset)
+        self.scheduler.run()
+        self.assertEqual(len(self.log.calls),1)
+        self.assertAlmostEqual(self.log.calls[0][0],10.9)
+
+    def test_reset_with_delay(self):
+        timer = self.scheduler.add_timer(delay=1,event='timer',handler=self.log)
+        self.scheduler.reset_timer(timer,delay=3)
+        self.scheduler.reset_timer(timer,delay=2)
+        self.scheduler.run()
+        self.assertEqual(self.log.calls,[(2,'timer')])
+        # a timer that fired can be armed again, with its last delay
+        self.scheduler.reset_timer(timer)
+        self.scheduler.run()
+        self.assertEqual(self.log.calls,[(2,'timer'),(4,'timer')])
+
+    def test_cancel_after_reset(self):
+        timer = self.scheduler.add_timer(delay=1,event='timer',handler=self.log)
+        def reset(event):
+            self.scheduler.reset_timer(timer,delay=0.5)
+        def cancel(event):
+            self.scheduler.cancel_timer(timer)
+        for i in range(10):
+            self.scheduler.add(delay=0.1*i,event=i,handler=reset)
+        self.scheduler.add(delay=1.2,event=None,handler=cancel)
+        self.scheduler.add(delay=5,event='end',handler=self.log)
+        self.scheduler.run()
+        self.assertEqual(self.log.calls,[(5,'end')])
+        self.assertEqual(self.scheduler.timers,0)
+
+    def test_cancel_when_due(self):
+        # a timer moved from the wheel into the heap can still be
+        # cancelled by an event added before it for the same time
+        timers = []
+        def cancel(event):
+            self.scheduler.cancel_timer(timers[0])
+        self.scheduler.add(delay=1,event=None,handler=cancel)
+        timers.append(self.scheduler.add_timer(delay=1,event='timer',
+                                               handler=self.log))
+        self.scheduler.run()
+        self.assertEqual(self.log.calls,[])
+
+class HeapTimerTest(TimerTest):
+    timer_wheel = False
+
+class WheelTest(unittest.TestCase):
+    ''' Events must run in the same order whether timers are kept in
+        the wheel or in the heap. '''
+    # delays shorter than a tick, within the first level of the wheel,
+    # in higher levels, and past the end of the wheel
+    delays = [0,0.0003,0.001,0.0025,0.01,0.2,0.3,70,20000,5000000]
+
+    def trial(self,seed,timer_wheel):
+        rng = random.Random(seed)
+        scheduler = Scheduler(timer_wheel=timer_wheel)
+        calls = []
+        entries = []
+        timers = []
+        count = [0]
+        def handler(event):
+            calls.append((scheduler.current_time(),event))
+            if len(calls) == 500:
+                # stop with events and timers pending, and start again
+                scheduler.stop()
+                scheduler.add(delay=0.0001,event='restart',handler=handler)
+                return
+            if count[0] > 2000:
+                return
+            for i in range(rng.randrange(1,3)):
+                count[0] += 1
+                choice = rng.random()
+                delay = rng.choice(self.delays[:-3])
+                if choice < 0.3:
+                    entries.append(scheduler.add(delay=0,event=count[0],
+                                                 handler=handler))
+                elif choice < 0.55:
+                    entries.append(scheduler.add(delay=delay,event=count[0],
+                                                 handler=handler))
+                else:
+                    delay = rng.choice(self.delays)
+                    timers.append(scheduler.add_timer(delay=delay,
+                                                      event=count[0],
+                                                      handler=handler))
+            if entries and rng.random() < 0.3:
+                scheduler.cancel(rng.choice(entries))
+            if timers and rng.random() < 0.3:
+                delay = rng.choice(self.delays[:-1] + [None])
+                scheduler.reset_timer(rng.choice(timers),delay)
+            if timers and rng.random() < 0.1:
+                scheduler.cancel_timer(rng.choice(timers))
+        scheduler.add(delay=0,event='start',handler=handler)
+        scheduler.add(delay=0.5,event='later',handler=handler)
+        scheduler.run()
+        return calls
+
+    def test_same_order(self):
+        for seed in range(20):
+            wheel = self.trial(seed,True)
+            heap = self.trial(seed,False)
+            self.assertIn('restart',[event for time,event in wheel])
+            self.assertEqual(wheel,heap)
+
+if __name__ == '__main__':
+    unittest.main()
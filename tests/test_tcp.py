@@ -0,0 +1,171 @@
+import os
+import random
+import unittest
+
+from networks.network import Network
+from src.sim import Simulation
+from src.tcp import TCP
+from src.transport import Transport
+
+CONFIG = os.path.join(os.path.dirname(__file__),'..','networks','one-hop.txt')
+
+class Receiver(object):
+    ''' Application that keeps the data it receives. '''
+    def __init__(self):
+        self.data = []
+
+    def receive_data(self,data):
+        self.data.append(str(data))
+
+class RecordingTCP(TCP):
+    ''' TCP that records when its retransmission timer fires and the
+        timeout it backs off to. '''
+    def __init__(self,*args,**kwargs):
+        TCP.__init__(self,*args,**kwargs)
+        self.timeouts = []
+
+    def retransmit(self,event):
+        TCP.retransmit(self,event)
+        self.timeouts.append((self.sim.scheduler.current_time(),self.timeout))
+
+class TCPTest(unittest.TestCase):
+    def setUp(self):
+        self.sim = Simulation(seed=1)
+        self.net = Network(CONFIG,sim=self.sim)
+        self.net.loss(0)
+        self.net.install_routes()
+        self.n1 = self.net.get_node('n1')
+        self.n2 = self.net.get_node('n2')
+        self.receiver = Receiver()
+
+    def connect(self,**kwargs):
+        ''' Return a sender on n1 and a receiver on n2. '''
+        sender = RecordingTCP(Transport(self.n1),self.n1.get_address('n2'),1,
+                              self.n2.get_address('n1'),1,**kwargs)
+        receiver = RecordingTCP(Transport(self.n2),self.n2.get_address('n1'),1,
+                                self.n1.get_address('n2'),1,self.receiver,
+                                **kwargs)
+        return sender,receiver
+
+    def message(self,size):
+        rng = random.Random(size)
+        return ''.join(chr(rng.randrange(256)) for i in range(size))
+
+class LossTest(TCPTest):
+    def test_lossy_transfer(self):
+        self.net.loss(0.1)
+        sender,receiver = self.connect(window=3000)
+        message = self.message(100000)
+        for i in range(0,len(message),1000):
+            self.sim.scheduler.add(delay=0,event=message[i:i+1000],
+                                   handler=sender.send)
+        self.sim.scheduler.run()
+        self.assertEqual(''.join(self.receiver.data),message)
+        self.assertEqual(sender.send_buffer.outstanding(),0)
+        self.assertTrue(sender.timeouts)
+        self.assertIsNone(sender.timer)
+
+    def test_backoff(self):
+        # nothing gets through until the loss is removed at 20 seconds
+        self.net.loss(1)
+        self.sim.scheduler.add(delay=20,event=0,handler=self.net.loss)
+        sender,receiver = self.connect(window=3000)
+        message = self.message(5000)
+        sender.send(message)
+        self.sim.scheduler.run()
+        self.assertEqual(''.join(self.receiver.data),message)
+        # the timeout doubles every time the timer fires
+        self.assertEqual(sender.timeouts,[(1,2),(3,4),(7,8),(15,16),(31,32)])
+        # and goes back to the retransmission timeout once data is acked
+        self.assertEqual(sender.timeout,sender.rto)
+
+class SackTest(TCPTest):
+    def drop(self,sequences):
+        ''' Drop the first data segment sent from n1 to n2 with each of
+            these sequence numbers, and record the sequence number of
+            every data segment sent. '''
+        link = self.n1.get_link('n2')
+        send_packet = link.send_packet
+        sent = []
+        def drop_packet(packet):
+            if packet.length > 0:
+                sent.append(packet.sequence)
+                if packet.sequence in sequences:
+                    sequences.remove(packet.sequence)
+                    packet.release()
+                    return
+            send_packet(packet)
+        link.send_packet = drop_packet
+        return sent
+
+    def test_retransmit_holes(self):
+        sent = self.drop(set([2000,5000,6000]))
+        sender,receiver = self.connect(window=10000)
+        message = self.message(10000)
+        sender.send(message)
+        self.sim.scheduler.run()
+        self.assertEqual(''.join(self.receiver.data),message)
+        # only the lost segments are sent again, by a fast retransmit
+        self.assertEqual(sent,range(0,10000,1000) + [2000,5000,6000])
+        self.assertEqual(sender.timeouts,[])
+
+    def test_without_sack(self):
+        sent = self.drop(set([2000,5000,6000]))
+        sender,receiver = self.connect(window=10000,sack=False)
+        message = self.message(10000)
+        sender.send(message)
+        self.sim.scheduler.run()
+        self.assertEqual(''.join(self.receiver.data),message)
+        # each partial ACK retransmits the next hole
+        self.assertEqual(sent[10:],[2000,5000,6000])
+        self.assertEqual(sender.timeouts,[])
+
+class DelayedAckTest(TCPTest):
+    def acks(self):
+        ''' Record the time and ack number of every ACK sent from n2 to
+            n1. '''
+        link = self.n2.get_link('n1')
+        send_packet = link.send_packet
+        acks = []
+        def record_packet(packet):
+            acks.append((self.sim.scheduler.current_time(),packet.ack_number))
+            send_packet(packet)
+        link.send_packet = record_packet
+        return acks
+
+    def test_every_second_segment(self):
+        acks = self.acks()
+        sender,receiver = self.connect(window=10000,delayed_ack=True)
+        message = self.message(10000)
+        sender.send(message)
+        self.sim.scheduler.run()
+        self.assertEqual(''.join(self.receiver.data),message)
+        self.assertEqual([ack for time,ack in acks],range(2000,10001,2000))
+        self.assertIsNone(receiver.ack_timer)
+
+    def test_single_segment(self):
+        acks = self.acks()
+        sender,receiver = self.connect(window=10000,delayed_ack=True)
+        sender.send(self.message(1000))
+        self.sim.scheduler.run()
+        # the segment arrives after 8 ms of transmission and 1 ms of
+        # propagation, and is ACKed when the delayed ACK timer fires
+        self.assertEqual(len(acks),1)
+        self.assertAlmostEqual(acks[0][0],0.009 + 0.2)
+        self.assertEqual(acks[0][1],1000)
+
+    def test_odd_segment(self):
+        acks = self.acks()
+        # once the sender has an RTT sample its timeout can be as short
+        # as 0.2 seconds, so the ACK delay has to be shorter than that
+        sender,receiver = self.connect(window=10000,delayed_ack=True,
+                                       ack_delay=0.1)
+        sender.send(self.message(3000))
+        self.sim.scheduler.run()
+        # the last segment waits for the timer
+        self.assertEqual([ack for time,ack in acks],[2000,3000])
+        self.assertAlmostEqual(acks[1][0] - acks[0][0],0.008 + 0.1)
+        self.assertEqual(sender.timeouts,[])
+
+if __name__ == '__main__':
+    unittest.main()
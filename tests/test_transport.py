@@ -0,0 +1,41 @@
+import unittest
+
+from src.node import Node
+from src.sim import Simulation
+from src.tcp import TCP
+from src.tcppacket import TCPPacket
+from src.transport import Transport
+
+class Recorder(object):
+    ''' Connection that records the packets it receives. '''
+    def __init__(self):
+        self.packets = []
+
+    def receive_packet(self,packet):
+        self.packets.append(packet)
+
+class FlowTest(unittest.TestCase):
+    def setUp(self):
+        self.transport = Transport(Node('n1',sim=Simulation()))
+
+    def test_out_of_range(self):
+        for values in [(65536,1,2,1),(1,65536,2,1),(1,1,2,70000),(1,-1,2,1)]:
+            self.assertRaises(ValueError,TCP,self.transport,*values)
+        self.assertRaises(ValueError,self.transport.listen,65536,Recorder)
+        self.assertEqual(self.transport.binding,{})
+
+    def test_no_collision(self):
+        # port 65536 + 1 would have the same id as address 2, port 1
+        connection = Recorder()
+        self.transport.bind(connection,1,1,2,1)
+        packet = TCPPacket(source_address=1,source_port=65537,
+                           destination_address=1,destination_port=1)
+        self.transport.receive_packet(packet)
+        self.assertEqual(connection.packets,[])
+        packet = TCPPacket(source_address=2,source_port=1,
+                           destination_address=1,destination_port=1)
+        self.transport.receive_packet(packet)
+        self.assertEqual(connection.packets,[packet])
+
+if __name__ == '__main__':
+    unittest.main()